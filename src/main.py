@@ -2,11 +2,37 @@
 @author: Louis Lebreton
 
 Serveur API REST qui expose plusieurs endpoints
+les dépendances lourdes (selenium, pandas, joblib, GBMs) sont importées par les endpoints au premier appel :
+l'API démarre et répond à /health immédiatement
+PRELOAD_MODELS=HRHP,LRLP précharge les modèles en tâche de fond au démarrage
 """
+import time
+
+_import_start = time.perf_counter()
+
+import os
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
-from src.routers import index, health, predict, api_data, tweets
+from src.routers import index, health, predict, api_data, tweets, metrics
+from src.services.api.metrics import MetricsMiddleware
+from src.services.api.model_cache import start_warm_up
+
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # warm-up optionnel : les requêtes sont servies pendant le chargement des modèles
+    risk_profiles = [profile for profile in os.getenv('PRELOAD_MODELS', '').split(',') if profile]
+    if risk_profiles:
+        start_warm_up(risk_profiles)
+    app.state.startup['ready_seconds'] = time.perf_counter() - _import_start
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
+
+# latence, erreurs et requêtes en cours par route (exposées sur /metrics)
+app.add_middleware(MetricsMiddleware)
 
 # routers
 app.include_router(index.router, tags=["Index"])
@@ -14,3 +40,7 @@ app.include_router(health.router, tags=["Health"])
 app.include_router(api_data.router, tags=["Economic & Bitcoin data"])
 app.include_router(tweets.router, tags=["Scrape tweets"])
 app.include_router(predict.router, tags=["Predict"])
+app.include_router(metrics.router, tags=["Metrics"])
+
+# temps de démarrage (import de l'application, puis prêt à servir après le lifespan), renvoyés par /health
+app.state.startup = {'import_seconds': time.perf_counter() - _import_start, 'ready_seconds': None}
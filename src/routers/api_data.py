@@ -4,23 +4,28 @@
 Endpoints pour récupérer :
 Données économiques traitées
 Données Bitcoin traitées
+pandas et les clients API sont importés au premier appel, pas au démarrage de l'API
 """
 import os
+from typing import Literal
 
-import pandas as pd
 from fastapi import APIRouter, Query
 
-from src.services.df_building.get_data_API import get_economic_data, get_BTC_data
-
 router = APIRouter()
 
 @router.get("/economic-data")
 def fetch_economic_data(
     start_date: str = Query(..., description="Date de début au format YYYY-MM-DD"),
-    end_date: str = Query(..., description="Date de fin au format YYYY-MM-DD")):
+    end_date: str = Query(..., description="Date de fin au format YYYY-MM-DD"),
+    response_format: Literal["json", "ndjson", "columnar", "parquet"] = Query(
+        "json", alias="format", description="json (défaut), ndjson ou columnar en streaming, parquet en téléchargement")):
     """
     Endpoint pour obtenir les données économiques traitées
     """
+    import pandas as pd
+    from src.services.df_building.get_data_API import get_economic_data
+    from src.services.api.serialization import dataframe_response
+
     series_list= [
             'DFF', 'NFINCP', 'FINCP', 'DPRIME', 'DPCREDIT',
             'DTWEXBGS', 'CPIAUCSL', 'DGS3MO', 'DGS1', 'DGS30'
@@ -45,19 +50,23 @@ def fetch_economic_data(
             df_economic[col] = df_economic[col].bfill()
             df_economic[col] = df_economic[col].ffill()
 
-        # conversion en dict JSON
-        result = df_economic.reset_index().to_dict(orient='records')
-        return result
+        # sérialisation depuis les tableaux numpy (json, ndjson / columnar en streaming, parquet)
+        return dataframe_response(df_economic, response_format, filename=f"economic_data_{start_date}_{end_date}")
 
     except Exception as e:
         return {"error": str(e)}
 
 
 @router.get("/bitcoin-data")
-def fetch_btc_data(days: int = Query(..., description="days (must be less than 365 days)")):
+def fetch_btc_data(days: int = Query(..., description="days (must be less than 365 days)"),
+                   response_format: Literal["json", "ndjson", "columnar", "parquet"] = Query(
+                       "json", alias="format", description="json (défaut), ndjson ou columnar en streaming, parquet en téléchargement")):
     """
     Endpoint pour obtenir les données Bitcoin traitées
     """
+    from src.services.df_building.get_data_API import get_BTC_data
+    from src.services.api.serialization import dataframe_response
+
     try:
         df_btc = get_BTC_data(days = days, interval = 'daily')
         
@@ -91,9 +100,8 @@ def fetch_btc_data(days: int = Query(..., description="days (must be less than 3
         df_btc.drop(columns=['date'], inplace=True)
         df_btc = df_btc.fillna(0)
         
-        # conversion en dict JSON
-        result = df_btc.reset_index().to_dict(orient='records')
-        return result
+        # sérialisation depuis les tableaux numpy (json, ndjson / columnar en streaming, parquet)
+        return dataframe_response(df_btc, response_format, filename=f"bitcoin_data_{days}d")
 
     except Exception as e:
         return {"error": str(e)}
@@ -3,14 +3,16 @@
 
 Endpoint de Health Check
 """
-from fastapi import APIRouter
+from fastapi import APIRouter, Request
 from datetime import datetime
 import os
 
+from src.services.api import model_cache
+
 router = APIRouter()
 
 @router.get("/health")
-def health_check():
+def health_check(request: Request):
     """
     Health Check Endpoint
     Purpose: Monitor API availability and system status
@@ -20,7 +22,10 @@ def health_check():
     
         system_status = {
             "service": "Healthy",
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": datetime.utcnow().isoformat(),
+            # temps de démarrage à froid et état du préchargement des modèles
+            "startup": getattr(request.app.state, "startup", None),
+            "models": model_cache.status()
         }
         return {
             "status": "success",
@@ -24,6 +24,7 @@ def index():
                 "Fetch Bitcoin & economic data",
                 "Predict financial trends",
                 "Convert tweets to sentiment score",
+                "Expose API latency metrics",
                 "Access API documentation"
             ],
             "api_documentation": "/docs",
@@ -38,11 +39,11 @@ def index():
                 },
                 {
                     "path": "/economic-data",
-                    "description": "Fetch processed economic data with start_date and end_date"
+                    "description": "Fetch processed economic data with start_date and end_date (format: json, ndjson, columnar or parquet)"
                 },
                 {
                     "path": "/bitcoin-data",
-                    "description": "Fetch processed Bitcoin data with days"
+                    "description": "Fetch processed Bitcoin data with days (format: json, ndjson, columnar or parquet)"
                 },
                 {
                     "path": "/predict",
@@ -51,6 +52,10 @@ def index():
                 {
                     "path": "/scrape-tweets",
                     "description": "Scrape tweets X accounts"
+                },
+                {
+                    "path": "/metrics",
+                    "description": "Per-route latency histograms, error counts, in-flight requests and /predict stage timings (Prometheus text format)"
                 }
             ],
             "timestamp": datetime.utcnow().isoformat()
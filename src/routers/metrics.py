@@ -0,0 +1,19 @@
+"""
+@author: Louis Lebreton
+
+Endpoint des métriques (format texte Prometheus)
+"""
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from src.services.api.metrics import REGISTRY
+
+router = APIRouter()
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """
+    Métriques de l'API : latence par route, requêtes par statut, erreurs, requêtes en cours
+    et durée des étapes de /predict
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -3,15 +3,15 @@
 @author: Louis Lebreton
 
 Prediction endpoint
+les dépendances lourdes (pandas, joblib, GBMs) sont importées au premier appel, pas au démarrage de l'API
 """
-import os
-
 from fastapi import APIRouter, Query, HTTPException
 from typing import List
-import pandas as pd
-import joblib
 import logging
 
+from src.services.api.metrics import stage_timer
+from src.services.api.model_cache import get_model
+
 # configuration du logger
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -33,30 +33,30 @@ def predict(
 
     Return : (list) prédictions
     """
-    import sys
-    import os
-    sys.path.append(os.path.abspath("src"))
+    from src.services.df_building.dataset_io import read_dataset_any
 
-    model_path = f"models/gbm_stacking_model_{risk_profile}.pkl"
     try:
-        #  chargement du modèle
-        gbm_stacking_model = joblib.load(model_path)
-        logger.info(f"Modèle '{model_path}' chargé avec succès.")
+        #  chargement du modèle (en cache après le premier appel ou le warm-up)
+        with stage_timer("/predict", "model_load"):
+            gbm_stacking_model = get_model(risk_profile)
+        logger.info(f"Modèle du profil '{risk_profile}' chargé avec succès.")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur lors du chargement du modèle : {e}")
 
-    data_path = f"data/data_{risk_profile}.csv"
     try:
-        # chargement des données
-        data = pd.read_csv(data_path, index_col=0, parse_dates=True)
-        logger.info(f"Données '{data_path}' chargées avec succès")
+        # chargement des données : csv float64 sans schéma, comme à l'entraînement des modèles
+        # (les formats float32 numpy / parquet arrondiraient les features, ex : market_cap)
+        with stage_timer("/predict", "data_load"):
+            data = read_dataset_any("data", f"data_{risk_profile}", formats=('csv',), schema=False)
+        logger.info(f"Données 'data/data_{risk_profile}' chargées avec succès")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur lors du chargement des données : {e}")
 
     # data preprocessing
     try:
-        data['label'] = data['label'].replace(-1, 2)
-        data_filtered = data[(data.index >= start_date) & (data.index <= end_date)]
+        with stage_timer("/predict", "filter"):
+            data['label'] = data['label'].replace(-1, 2)
+            data_filtered = data[(data.index >= start_date) & (data.index <= end_date)]
         if data_filtered.empty:
             raise ValueError("Aucune donnée disponible pour l'intervalle de dates spécifié")
 
@@ -65,7 +65,8 @@ def predict(
 
     # prediction
     try:
-        predictions = gbm_stacking_model.predict(data_filtered.drop(columns=['label']))
+        with stage_timer("/predict", "inference"):
+            predictions = gbm_stacking_model.predict(data_filtered.drop(columns=['label']))
         return predictions.tolist()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur lors de la prédiction : {e}")
@@ -2,18 +2,13 @@
 @author: Louis Lebreton
 
 Tweets scraping endpoint
+selenium, webdriver_manager et le store Parquet sont importés au premier appel, pas au démarrage de l'API
 """
 import os
 from datetime import datetime
 from fastapi import APIRouter, Query
-from selenium import webdriver
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
 from concurrent.futures import ThreadPoolExecutor
 
-from src.services.df_building.get_data_scraping import scrape_tweets_one_account
-
 router = APIRouter()
 
 @router.get("/scrape-tweets")
@@ -28,6 +23,15 @@ def scrape_tweets(
     """
     Scrape les tweets de plusieurs comptes X sur une période choisie
     """
+    from selenium import webdriver
+    from webdriver_manager.chrome import ChromeDriverManager
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.chrome.service import Service
+
+    from src.services.df_building.get_data_scraping import scrape_tweets_one_account
+    from src.services.df_building.tweets_store import TweetStore
+    from src.services.df_building.scraping_checkpoint import load_checkpoint
+
     # mon compte X
     LOGIN = os.getenv('LOGIN')
     PASSWORD = os.getenv('PASSWORD')
@@ -44,9 +48,16 @@ def scrape_tweets(
     # avec ou sans le visuel sur les pages webs
     # options.add_argument("--headless")
 
+    # store Parquet consolidé des tweets
+    store = TweetStore()
+
     # parallelisation
     with ThreadPoolExecutor(max_workers=num_workers) as executor:
         for account in accounts_list:
+            # checkpoint durable : reprise après un crash, comptes terminés ignorés
+            checkpoint = load_checkpoint(account, start_date, end_date)
+            if checkpoint.done:
+                continue
             driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
             # scraping des tweets d'un compte X entre 2 dates
-            executor.submit(scrape_tweets_one_account, LOGIN, PASSWORD, account, since_date, until_date, driver)
+            executor.submit(scrape_tweets_one_account, LOGIN, PASSWORD, account, since_date, until_date, driver, store, checkpoint)
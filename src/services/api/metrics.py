@@ -0,0 +1,157 @@
+"""
+@author: Louis Lebreton
+Métriques de l'API au format texte Prometheus (sans dépendance externe)
+- latence par route (histogramme), requêtes par code de statut, erreurs, requêtes en cours
+- timers nommés des étapes d'un endpoint (ex : /predict : model_load, data_load, filter, inference)
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+# bornes des histogrammes (secondes)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+@dataclass
+class Histogram:
+    """
+    histogramme cumulatif : nombre d'observations par borne, somme et total
+    """
+    buckets: tuple = LATENCY_BUCKETS
+    counts: list = field(default=None)
+    sum: float = 0.0
+    count: int = 0
+
+    def __post_init__(self):
+        self.counts = [0] * (len(self.buckets) + 1)  # dernière case : +Inf
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _labels(**labels) -> str:
+    return ','.join(f'{name}="{value}"' for name, value in labels.items())
+
+
+class MetricsRegistry:
+    """
+    registre des métriques du process, protégé par un verrou (endpoints sync exécutés dans un threadpool)
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.request_latency = {}   # (method, route) -> Histogram
+        self.requests_total = {}    # (method, route, status) -> int
+        self.errors_total = {}      # (method, route) -> int
+        self.stage_latency = {}     # (endpoint, stage) -> Histogram
+        self.in_flight = 0
+
+    def observe_request(self, method: str, route: str, status: int, duration: float) -> None:
+        with self.lock:
+            self.request_latency.setdefault((method, route), Histogram()).observe(duration)
+            key = (method, route, status)
+            self.requests_total[key] = self.requests_total.get(key, 0) + 1
+            if status >= 500:
+                self.errors_total[(method, route)] = self.errors_total.get((method, route), 0) + 1
+
+    def observe_stage(self, endpoint: str, stage: str, duration: float) -> None:
+        with self.lock:
+            self.stage_latency.setdefault((endpoint, stage), Histogram()).observe(duration)
+
+    def _render_histogram(self, name: str, histogram: Histogram, labels: str) -> list:
+        lines, cumulative = [], 0
+        for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_sum{{{labels}}} {histogram.sum}')
+        lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+        return lines
+
+    def render(self) -> str:
+        """
+        exposition au format texte Prometheus 0.0.4
+        """
+        with self.lock:
+            lines = ['# HELP http_request_duration_seconds Latence des requêtes HTTP par route',
+                     '# TYPE http_request_duration_seconds histogram']
+            for (method, route), histogram in sorted(self.request_latency.items()):
+                lines += self._render_histogram('http_request_duration_seconds', histogram,
+                                                _labels(method=method, route=route))
+
+            lines += ['# HELP http_requests_total Requêtes HTTP par route et code de statut',
+                      '# TYPE http_requests_total counter']
+            for (method, route, status), count in sorted(self.requests_total.items()):
+                lines.append(f'http_requests_total{{{_labels(method=method, route=route, status=status)}}} {count}')
+
+            lines += ['# HELP http_request_errors_total Requêtes HTTP en erreur (statut >= 500 ou exception)',
+                      '# TYPE http_request_errors_total counter']
+            for (method, route), count in sorted(self.errors_total.items()):
+                lines.append(f'http_request_errors_total{{{_labels(method=method, route=route)}}} {count}')
+
+            lines += ['# HELP http_requests_in_flight Requêtes HTTP en cours de traitement',
+                      '# TYPE http_requests_in_flight gauge',
+                      f'http_requests_in_flight {self.in_flight}']
+
+            lines += ["# HELP stage_duration_seconds Durée des étapes nommées d'un endpoint",
+                      '# TYPE stage_duration_seconds histogram']
+            for (endpoint, stage), histogram in sorted(self.stage_latency.items()):
+                lines += self._render_histogram('stage_duration_seconds', histogram,
+                                                _labels(endpoint=endpoint, stage=stage))
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+
+@contextmanager
+def stage_timer(endpoint: str, stage: str, registry: MetricsRegistry = REGISTRY):
+    """
+    chronomètre une étape nommée d'un endpoint
+
+    Args :
+    - endpoint (str): chemin de l'endpoint (ex : /predict)
+    - stage (str): nom de l'étape (ex : inference)
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe_stage(endpoint, stage, time.perf_counter() - start)
+
+
+class MetricsMiddleware:
+    """
+    middleware ASGI (plus léger que BaseHTTPMiddleware) : latence, statut et requêtes en cours
+    la route est le chemin déclaré (ex : /predict), pas l'URL, pour borner le nombre de séries
+    """
+    def __init__(self, app, registry: MetricsRegistry = REGISTRY):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        with self.registry.lock:
+            self.registry.in_flight += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            duration = time.perf_counter() - start
+            with self.registry.lock:
+                self.registry.in_flight -= 1
+            # route renseignée par le routeur FastAPI une fois la requête routée
+            route = getattr(scope.get('route'), 'path', 'unmatched')
+            self.registry.observe_request(scope['method'], route, status, duration)
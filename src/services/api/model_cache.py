@@ -0,0 +1,90 @@
+"""
+@author: Louis Lebreton
+Cache des modèles de prédiction de l'API
+- chargement paresseux (joblib et les GBMs ne sont importés qu'au premier chargement)
+- un modèle est chargé une fois par process et rechargé si son fichier change
+- l'artefact natif (GBMStacking.save) est préféré au pickle joblib s'il existe
+- préchargement optionnel en tâche de fond au démarrage (warm-up)
+"""
+import logging
+import os
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+MODEL_PATH = "models/gbm_stacking_model_{risk_profile}.pkl"
+ARTIFACT_PATH = "models/gbm_stacking_{risk_profile}"
+
+_lock = threading.Lock()
+_models = {}     # risk_profile -> (mtime du fichier, modèle)
+_warmup = {"status": "disabled", "risk_profiles": [], "seconds": None, "errors": {}}
+
+
+def get_model(risk_profile: str):
+    """
+    modèle GBM stacking d'un profil de risque, chargé au premier appel
+
+    Args :
+    - risk_profile (str): HRHP ou LRLP
+
+    Return:
+    - modèle entraîné
+    """
+    artifact_manifest = os.path.join(ARTIFACT_PATH.format(risk_profile=risk_profile), "manifest.json")
+    native = os.path.exists(artifact_manifest)
+    path = artifact_manifest if native else MODEL_PATH.format(risk_profile=risk_profile)
+    mtime = os.path.getmtime(path)
+    with _lock:
+        cached = _models.get(risk_profile)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        start = time.perf_counter()
+        if native:
+            # formats natifs des GBMs, sans pickle, hash des fichiers vérifiés
+            from src.services.prediction.GBM_stacking import GBMStacking
+            model = GBMStacking.load(os.path.dirname(path))
+        else:
+            import joblib
+
+            # le modèle picklé référence services.prediction.GBM_stacking (src dans le path)
+            src_path = os.path.abspath("src")
+            if src_path not in sys.path:
+                sys.path.append(src_path)
+            model = joblib.load(path)
+        _models[risk_profile] = (mtime, model)
+        logger.info(f"Modèle '{path}' chargé en {time.perf_counter() - start:.2f}s")
+        return model
+
+
+def _warm_up(risk_profiles: list) -> None:
+    start = time.perf_counter()
+    for risk_profile in risk_profiles:
+        try:
+            get_model(risk_profile)
+        except Exception as e:
+            _warmup["errors"][risk_profile] = str(e)
+    _warmup["seconds"] = time.perf_counter() - start
+    _warmup["status"] = "done"
+
+
+def start_warm_up(risk_profiles: list) -> threading.Thread:
+    """
+    précharge les modèles dans un thread : l'API répond (ex : /health) pendant le chargement
+
+    Args :
+    - risk_profiles (list): profils de risque à précharger
+    """
+    _warmup.update(status="running", risk_profiles=list(risk_profiles))
+    thread = threading.Thread(target=_warm_up, args=(list(risk_profiles),), name="model-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def status() -> dict:
+    """
+    état du warm-up et modèles en cache
+    """
+    return {**_warmup, "loaded": sorted(_models)}
@@ -0,0 +1,111 @@
+"""
+@author: Louis Lebreton
+Sérialisation des DataFrames renvoyés par l'API, construite directement depuis les tableaux numpy
+(sans liste de dicts intermédiaire ni encodeur JSON générique de FastAPI)
+- json : liste d'enregistrements (format historique)
+- ndjson : un enregistrement JSON par ligne, envoyé en streaming par blocs
+- columnar : {"columns": [...], "data": {colonne: [valeurs]}}, envoyé en streaming colonne par colonne
+- parquet : fichier Parquet (Arrow) en téléchargement
+"""
+import io
+import json
+
+import numpy as np
+import pandas as pd
+from fastapi.responses import Response, StreamingResponse
+
+RESPONSE_FORMATS = ('json', 'ndjson', 'columnar', 'parquet')
+
+# nombre de lignes sérialisées par bloc : la mémoire de sérialisation ne dépend pas de la plage demandée
+CHUNK_SIZE = 1024
+
+
+def _column_values(values: np.ndarray) -> list:
+    """
+    valeurs python sérialisables d'une colonne (NaN -> null)
+    """
+    python_values = values.tolist()
+    if np.issubdtype(values.dtype, np.floating):
+        for i in np.flatnonzero(np.isnan(values)):
+            python_values[i] = None
+    return python_values
+
+
+def _datetime_strings(column) -> np.ndarray:
+    """
+    dates ISO 8601 d'une colonne datetime (NaT -> None), en secondes ou en microsecondes pour toute la colonne :
+    microsecondes seulement si une date en a (comme isoformat dans le format json)
+    """
+    missing = column.isna().to_numpy()
+    if column.dt.tz is None:
+        values = column.to_numpy(dtype='datetime64[us]')
+        unit = 's' if (values[~missing].view(np.int64) % 1_000_000 == 0).all() else 'us'
+        strings = np.datetime_as_string(values, unit=unit).astype(object)
+    else:
+        # fuseau horaire : décalage inclus (ex : +00:00), comme Timestamp.isoformat
+        timespec = 'seconds' if (column[~missing].dt.microsecond == 0).all() else 'microseconds'
+        strings = np.array([None if value is pd.NaT else value.isoformat(timespec=timespec) for value in column],
+                           dtype=object)
+    strings[missing] = None
+    return strings
+
+
+def _columns(df) -> tuple:
+    """
+    noms et tableaux numpy des colonnes, index compris (comme reset_index)
+    les colonnes datetime sont converties en texte une fois, avant le découpage en blocs
+    """
+    df = df.reset_index()
+    arrays = [_datetime_strings(df[column]) if pd.api.types.is_datetime64_any_dtype(df[column])
+              else df[column].to_numpy() for column in df.columns]
+    return [str(column) for column in df.columns], arrays
+
+
+def _ndjson_chunks(names: list, arrays: list, chunk_size: int):
+    for start in range(0, len(arrays[0]) if arrays else 0, chunk_size):
+        columns = [_column_values(array[start:start + chunk_size]) for array in arrays]
+        yield ''.join(json.dumps(dict(zip(names, row))) + '\n' for row in zip(*columns))
+
+
+def _columnar_chunks(names: list, arrays: list, chunk_size: int):
+    yield '{"columns": ' + json.dumps(names) + ', "data": {'
+    for i, (name, array) in enumerate(zip(names, arrays)):
+        yield (', ' if i else '') + json.dumps(name) + ': ['
+        for start in range(0, len(array), chunk_size):
+            values = json.dumps(_column_values(array[start:start + chunk_size]))[1:-1]
+            yield (', ' if start and values else '') + values
+        yield ']'
+    yield '}}'
+
+
+def dataframe_response(df, response_format: str = 'json', filename: str = 'data', chunk_size: int = CHUNK_SIZE):
+    """
+    réponse HTTP d'un DataFrame indexé (l'index devient la première colonne)
+
+    Args :
+    - df (pd.DataFrame): données à renvoyer
+    - response_format (str): json, ndjson, columnar ou parquet
+    - filename (str): nom du fichier téléchargé (parquet)
+    - chunk_size (int): nombre de lignes par bloc envoyé (ndjson, columnar)
+
+    Return:
+    - list (json) ou Response / StreamingResponse
+    """
+    if response_format == 'json':
+        return df.reset_index().to_dict(orient='records')
+
+    if response_format == 'parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        buffer = io.BytesIO()
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=True), buffer)
+        return Response(content=buffer.getvalue(), media_type='application/vnd.apache.parquet',
+                        headers={'Content-Disposition': f'attachment; filename="{filename}.parquet"'})
+
+    names, arrays = _columns(df)
+    if response_format == 'ndjson':
+        return StreamingResponse(_ndjson_chunks(names, arrays, chunk_size), media_type='application/x-ndjson')
+    if response_format == 'columnar':
+        return StreamingResponse(_columnar_chunks(names, arrays, chunk_size), media_type='application/json')
+    raise ValueError(f"format de réponse inconnu '{response_format}' (formats : {RESPONSE_FORMATS})")
@@ -0,0 +1,368 @@
+"""
+@author: Louis Lebreton
+Pipeline hors-ligne de construction des datasets (remplace l'exécution cellule par cellule de df_builder.ipynb)
+
+Étapes : load -> features -> [ga -> labeling -> join -> split -> export] par profil de risque
+- avec --multi-objective, une seule recherche NSGA-II (étape pareto) remplace les GA des profils :
+  chaque profil choisit son individu sur le front de Pareto (profit, drawdown) ; --islands n'y est pas supporté
+- chaque étape est mise en cache (data/.cache/) sous une clef de hash du contenu de ses entrées
+- les branches des profils de risque (HRHP, LRLP) tournent en parallèle dans des processus séparés
+- le temps de chaque étape est affiché
+
+Usage (depuis src/, comme le notebook) :
+python -m services.df_building.build_pipeline --data-dir ../data --profiles HRHP LRLP
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import pickle
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from services.df_building.dataset_io import FORMATS, dataset_path, write_dataset
+from services.df_building.market_features import load_btc_csv, btc_features, clean_economic_data
+from services.df_building.sentiment_features import SENTIMENT_COLUMNS, sentiment_stats, daily_sentiment, sentiment_features
+
+RISK_PROFILES = {
+    'HRHP': {'weight_p': 0.7, 'weight_mdd': 0.3}, # High risk High profit
+    'LRLP': {'weight_p': 0.3, 'weight_mdd': 0.7}, # Low risk Low profit
+}
+
+# séries FRED utilisées dans les datasets
+SERIES_LIST = ['DFF', 'NFINCP', 'FINCP', 'DPRIME', 'DPCREDIT',
+               'DTWEXBGS', 'CPIAUCSL', 'DGS3MO', 'DGS1', 'DGS30']
+
+# années conservées (hors COVID)
+YEARS = [2018, 2019, 2022, 2023, 2024]
+
+
+def file_hash(path: str) -> str:
+    """
+    hash sha256 du contenu d'un fichier
+    """
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def stage_key(*parts) -> str:
+    """
+    clef d'une étape : hash des clefs des étapes amont et des paramètres
+    """
+    payload = json.dumps(parts, sort_keys=True, default=str).encode()
+    return hashlib.sha256(payload).hexdigest()[:16]
+
+
+@dataclass
+class StageCache:
+    """
+    cache des sorties d'étapes sur disque (pickle) indexé par nom d'étape et clef de contenu
+
+    Attributes:
+        cache_dir (str): dossier du cache
+        enabled (bool): si False, toutes les étapes sont recalculées
+        prefix (str): préfixe affiché devant les temps (ex : profil de risque)
+    """
+    cache_dir: str = 'data/.cache'
+    enabled: bool = True
+    prefix: str = ''
+
+    def run(self, stage: str, key: str, func, *args, **kwargs):
+        """
+        exécute une étape si sa sortie n'est pas déjà en cache et affiche son temps
+        """
+        path = os.path.join(self.cache_dir, f'{stage}-{key}.pkl')
+        start = time.perf_counter()
+
+        if self.enabled and os.path.exists(path):
+            with open(path, 'rb') as f:
+                result = pickle.load(f)
+            print(f'{self.prefix}[{stage:<9}] {time.perf_counter() - start:8.2f}s (cache {key})')
+            return result
+
+        result = func(*args, **kwargs)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        print(f'{self.prefix}[{stage:<9}] {time.perf_counter() - start:8.2f}s')
+        return result
+
+
+# ----------------------------------------------------------------------------- étapes
+
+def stage_load(btc_path: str, economic_path: str, tweets_path: str, start_date: str, end_date: str) -> tuple:
+    """
+    chargement des données brutes : BTC (csv Coincodex), FRED (csv ou API), tweets scorés (csv)
+    """
+    df_btc = load_btc_csv(btc_path)
+
+    if economic_path:
+        df_economic = pd.read_csv(economic_path)
+    else:
+        from services.df_building.get_data_API import get_economic_data
+        df_economic = get_economic_data(series_id_list=SERIES_LIST, api_key=os.getenv('FRED_API_KEY'),
+                                        start_date=start_date, end_date=end_date)
+
+    df_tweets = pd.read_csv(tweets_path, usecols=['author', 'timestamp'] + SENTIMENT_COLUMNS)
+    return df_btc, df_economic, df_tweets
+
+
+def stage_features(df_btc: pd.DataFrame, df_economic: pd.DataFrame, df_tweets: pd.DataFrame) -> tuple:
+    """
+    variables BTC, traitement FRED et agrégation journalière des scores de sentiment
+    """
+    df_tweets_daily, _ = daily_sentiment(sentiment_stats(df_tweets))
+    return btc_features(df_btc), clean_economic_data(df_economic), sentiment_features(df_tweets_daily)
+
+
+def stage_ga(target_price: pd.Series, weight_p: float, weight_mdd: float,
+             population_size: int, nb_gen: int, crossover: float, mutation: float, seed: int,
+             islands: int = 1, barrier_mode: str = 'fixed', high_price: pd.Series = None,
+             low_price: pd.Series = None, tie_rule: str = 'lower') -> tuple:
+    """
+    optimisation génétique des paramètres de la TBM pour un profil de risque
+    avec islands > 1, la population est répartie en îles évoluant dans des processus séparés
+    avec high_price / low_price, les labels évalués sont ceux du mode OHLC
+    """
+    from services.df_building.get_labels.GA_optimization import (build_toolbox, run_genetic_algorithm,
+                                                                 run_island_genetic_algorithm)
+
+    if islands > 1:
+        toolbox_factory = partial(build_toolbox, target_price, weight_p=weight_p, weight_mdd=weight_mdd,
+                                  barrier_mode=barrier_mode, high_price=high_price, low_price=low_price,
+                                  tie_rule=tie_rule)
+        best_individual, best_fitness, _ = run_island_genetic_algorithm(
+            toolbox_factory, n_islands=islands, population_size=population_size // islands, nb_gen=nb_gen,
+            crossover=crossover, mutation=mutation, seed=seed)
+        return best_individual, best_fitness
+
+    random.seed(seed)
+    np.random.seed(seed)
+    toolbox = build_toolbox(target_price, weight_p=weight_p, weight_mdd=weight_mdd, barrier_mode=barrier_mode,
+                            high_price=high_price, low_price=low_price, tie_rule=tie_rule)
+    best_individual, best_fitness = run_genetic_algorithm(toolbox, population_size=population_size, nb_gen=nb_gen,
+                                                          crossover=crossover, mutation=mutation)
+    return list(best_individual), float(best_fitness)
+
+
+def stage_pareto(target_price: pd.Series, population_size: int, nb_gen: int, crossover: float, mutation: float,
+                 seed: int, barrier_mode: str = 'fixed', high_price: pd.Series = None, low_price: pd.Series = None,
+                 tie_rule: str = 'lower') -> pd.DataFrame:
+    """
+    recherche NSGA-II profit / drawdown commune à tous les profils de risque
+    chaque génome est labélisé et simulé une seule fois
+    """
+    from services.df_building.get_labels.GA_optimization import build_toolbox, run_nsga2, pareto_table
+
+    random.seed(seed)
+    np.random.seed(seed)
+    toolbox = build_toolbox(target_price, barrier_mode=barrier_mode, high_price=high_price, low_price=low_price,
+                            tie_rule=tie_rule, multi_objective=True)
+    front = run_nsga2(toolbox, population_size=population_size, nb_gen=nb_gen, crossover=crossover, mutation=mutation)
+    return pareto_table(front)
+
+
+def stage_labeling(target_price: pd.Series, best_individual: list, barrier_mode: str = 'fixed',
+                   high_price: pd.Series = None, low_price: pd.Series = None, tie_rule: str = 'lower') -> pd.Series:
+    """
+    labélisation du prix BTC avec les meilleurs paramètres TBM (mode OHLC avec high_price / low_price)
+    """
+    from services.df_building.get_labels.triple_barrier_method import TripleBarrierMethod
+
+    tbm = TripleBarrierMethod(target_price, lower_barrier=best_individual[0], upper_barrier=best_individual[1],
+                              time_barrier=int(best_individual[2]), barrier_mode=barrier_mode,
+                              high_price=high_price, low_price=low_price, tie_rule=tie_rule)
+    return tbm.label_data()['label']
+
+
+def stage_join(df_btc: pd.DataFrame, labels: pd.Series, df_economic: pd.DataFrame,
+               df_tweets_agg: pd.DataFrame) -> pd.DataFrame:
+    """
+    jointure BTC + label + FRED + sentiment sur la date journalière, hors années COVID
+    """
+    df_btc = df_btc.join(labels.rename('label'), how='left')
+    df_btc_filtered = df_btc[df_btc.index.year.isin(YEARS)]
+    return df_btc_filtered.join([df_economic, df_tweets_agg], how='left')
+
+
+def stage_split(df_complet: pd.DataFrame, train_share: float) -> tuple:
+    """
+    découpage chronologique train / test
+    """
+    split_index = int(len(df_complet) * train_share)
+    return df_complet.iloc[:split_index], df_complet.iloc[split_index:]
+
+
+def stage_export(data_dir: str, risk_profile: str, df_complet: pd.DataFrame, df_train: pd.DataFrame,
+                 df_test: pd.DataFrame, best_individual: list, best_fitness: float, formats: list) -> list:
+    """
+    export des datasets (complet, train, test) dans chaque format et des paramètres buy_number / sell_number
+    """
+    paths = []
+    for name, df in (('data', df_complet), ('train', df_train), ('test', df_test)):
+        for fmt in formats:
+            path = dataset_path(data_dir, f'{name}_{risk_profile}', fmt)
+            if fmt == 'csv':
+                # csv identique à celui du notebook (float64, ordre des colonnes d'origine)
+                df.to_csv(path, index=True)
+            else:
+                write_dataset(df, path)
+            paths.append(path)
+
+    tbm_parameters = {'buy_number': best_individual[3], 'sell_number': best_individual[4], 'fitness': best_fitness}
+    path = os.path.join(data_dir, f'tbm_parameters_{risk_profile}.json')
+    with open(path, 'w') as json_file:
+        json.dump(tbm_parameters, json_file, indent=1)
+    paths.append(path)
+    return paths
+
+
+# ----------------------------------------------------------------------------- orchestration
+
+def run_profile(risk_profile: str, features_key: str, features: tuple, params: dict, pareto: tuple = None) -> list:
+    """
+    branche d'un profil de risque : ga -> labeling -> join -> split -> export
+    exécutée dans un processus séparé
+    avec pareto = (clef, front de Pareto), l'étape ga est remplacée par le choix de l'individu sur le front
+    """
+    df_btc, df_economic, df_tweets_agg = features
+    cache = StageCache(cache_dir=params['cache_dir'], enabled=params['use_cache'], prefix=f'{risk_profile} ')
+    weights = RISK_PROFILES[risk_profile]
+
+    ga_params = {k: params[k] for k in ('population_size', 'nb_gen', 'crossover', 'mutation', 'seed', 'islands',
+                                        'barrier_mode', 'tie_rule')}
+    # mode OHLC : barrière haute testée sur High, barrière basse sur Low
+    ohlc_prices = {'high_price': df_btc['High'], 'low_price': df_btc['Low']} if params['ohlc'] else {}
+    if pareto is not None:
+        from services.df_building.get_labels.GA_optimization import select_from_front
+
+        pareto_key, df_front = pareto
+        ga_key = stage_key(pareto_key, weights)
+        best_individual, best_fitness = select_from_front(df_front, **weights)
+        print(f'{risk_profile} individu choisi sur le front de Pareto : fitness {best_fitness:.2f}')
+    else:
+        ga_key = stage_key(features_key, weights, ga_params, params['ohlc'])
+        best_individual, best_fitness = cache.run('ga', ga_key, stage_ga, df_btc['price'], **weights, **ga_params,
+                                                  **ohlc_prices)
+
+    labeling_key = stage_key(ga_key, 'labeling')
+    labels = cache.run('labeling', labeling_key, stage_labeling, df_btc['price'], best_individual,
+                       params['barrier_mode'], tie_rule=params['tie_rule'], **ohlc_prices)
+
+    join_key = stage_key(labeling_key, 'join')
+    df_complet = cache.run('join', join_key, stage_join, df_btc, labels, df_economic, df_tweets_agg)
+
+    split_key = stage_key(join_key, params['train_share'])
+    df_train, df_test = cache.run('split', split_key, stage_split, df_complet, params['train_share'])
+
+    # l'export n'est sauté que si les fichiers exportés existent toujours
+    export_key = stage_key(split_key, params['data_dir'], params['formats'])
+    expected_paths = [dataset_path(params['data_dir'], f'{name}_{risk_profile}', fmt)
+                      for name in ('data', 'train', 'test') for fmt in params['formats']]
+    expected_paths.append(os.path.join(params['data_dir'], f'tbm_parameters_{risk_profile}.json'))
+    export_cache = StageCache(cache_dir=cache.cache_dir, prefix=cache.prefix,
+                              enabled=cache.enabled and all(os.path.exists(path) for path in expected_paths))
+    return export_cache.run('export', export_key, stage_export, params['data_dir'], risk_profile,
+                            df_complet, df_train, df_test, best_individual, best_fitness, params['formats'])
+
+
+def run_pipeline(params: dict) -> dict:
+    """
+    exécute le pipeline complet
+
+    Args :
+    - params (dict): paramètres issus de la ligne de commande
+
+    Return:
+    - (dict) fichiers exportés par profil de risque
+    """
+    start = time.perf_counter()
+    cache = StageCache(cache_dir=params['cache_dir'], enabled=params['use_cache'])
+
+    # load : clef = contenu des fichiers d'entrée
+    input_paths = [params['btc_path'], params['economic_path'], params['tweets_path']]
+    load_key = stage_key([file_hash(p) if p else None for p in input_paths], params['start_date'], params['end_date'])
+    raw = cache.run('load', load_key, stage_load, *input_paths, params['start_date'], params['end_date'])
+
+    features_key = stage_key(load_key, 'features')
+    features = cache.run('features', features_key, stage_features, *raw)
+
+    # multi-objectif : un seul front de Pareto partagé par les profils
+    pareto = None
+    if params['multi_objective']:
+        df_btc = features[0]
+        pareto_params = {k: params[k] for k in ('population_size', 'nb_gen', 'crossover', 'mutation', 'seed',
+                                                'barrier_mode', 'tie_rule')}
+        ohlc_prices = {'high_price': df_btc['High'], 'low_price': df_btc['Low']} if params['ohlc'] else {}
+        pareto_key = stage_key(features_key, 'pareto', pareto_params, params['ohlc'])
+        pareto = (pareto_key, cache.run('pareto', pareto_key, stage_pareto, df_btc['price'], **pareto_params,
+                                        **ohlc_prices))
+
+    # profils de risque indépendants : un processus par profil
+    exports = {}
+    with ProcessPoolExecutor(max_workers=params['workers']) as executor:
+        futures = {profile: executor.submit(run_profile, profile, features_key, features, params, pareto)
+                   for profile in params['profiles']}
+        for profile, future in futures.items():
+            exports[profile] = future.result()
+
+    print(f'pipeline terminé en {time.perf_counter() - start:.2f}s')
+    return exports
+
+
+def parse_args(argv=None) -> dict:
+    parser = argparse.ArgumentParser(description='Construction des datasets data/train/test par profil de risque')
+    parser.add_argument('--data-dir', default='data', help='dossier des données')
+    parser.add_argument('--btc-path', default=None, help='csv BTC Coincodex (défaut : {data-dir}/bitcoin_2018-01-01_2025-01-01.csv)')
+    parser.add_argument('--economic-path', default=None, help='csv FRED déjà récupéré (défaut : API FRED via FRED_API_KEY)')
+    parser.add_argument('--tweets-path', default=None, help='csv des tweets scorés (défaut : {data-dir}/data_tweets.csv)')
+    parser.add_argument('--start-date', default='2018-01-01')
+    parser.add_argument('--end-date', default='2025-01-01')
+    parser.add_argument('--profiles', nargs='+', default=list(RISK_PROFILES), choices=list(RISK_PROFILES))
+    parser.add_argument('--population-size', type=int, default=200)
+    parser.add_argument('--nb-gen', type=int, default=10)
+    parser.add_argument('--crossover', type=float, default=0.7)
+    parser.add_argument('--mutation', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=999)
+    parser.add_argument('--barrier-mode', default='fixed', choices=['fixed', 'volatility'],
+                        help='barrières en pourcentage fixe ou en multiples de la volatilité')
+    parser.add_argument('--ohlc', action='store_true',
+                        help='barrière haute testée sur High et barrière basse sur Low (touches intra-journalières)')
+    parser.add_argument('--tie-rule', default='lower', choices=['lower', 'upper', 'hold'],
+                        help='label si les deux barrières sont touchées le même jour (mode OHLC)')
+    parser.add_argument('--multi-objective', action='store_true',
+                        help='une seule recherche NSGA-II profit / drawdown pour tous les profils (front de Pareto)')
+    parser.add_argument('--islands', type=int, default=1, help="nombre d'îles du GA (processus par profil), sans --multi-objective")
+    parser.add_argument('--train-share', type=float, default=0.85)
+    parser.add_argument('--formats', nargs='+', default=['csv', 'parquet'], choices=list(FORMATS),
+                        help="formats d'export des datasets")
+    parser.add_argument('--workers', type=int, default=2, help='nombre de profils traités en parallèle')
+    parser.add_argument('--cache-dir', default=None, help='dossier du cache (défaut : {data-dir}/.cache)')
+    parser.add_argument('--no-cache', dest='use_cache', action='store_false', help='recalcule toutes les étapes')
+    params = vars(parser.parse_args(argv))
+    if params['multi_objective'] and params['islands'] > 1:
+        parser.error("--islands n'est pas supporté avec --multi-objective (NSGA-II dans un seul processus)")
+
+    data_dir = params['data_dir']
+    params['btc_path'] = params['btc_path'] or os.path.join(data_dir, 'bitcoin_2018-01-01_2025-01-01.csv')
+    params['tweets_path'] = params['tweets_path'] or os.path.join(data_dir, 'data_tweets.csv')
+    params['cache_dir'] = params['cache_dir'] or os.path.join(data_dir, '.cache')
+    return params
+
+
+if __name__ == '__main__':
+    # stats json du GA par génération
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    run_pipeline(parse_args())
@@ -0,0 +1,181 @@
+"""
+@author: Louis Lebreton
+Lecture / écriture des datasets (data_*, train_*, test_*) avec un schéma explicite
+- features en float32, label en int8, index datetime64[ns]
+- formats : parquet, blocs numpy memory-mappables (dossier .numpy) ou csv
+"""
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+LABEL_COLUMN = 'label'
+FORMATS = {'csv': '.csv', 'parquet': '.parquet', 'numpy': '.numpy'}
+
+
+def dataset_path(data_dir: str, name: str, fmt: str) -> str:
+    """
+    chemin d'un dataset pour un format (ex : data/data_HRHP.parquet)
+    """
+    return os.path.join(data_dir, f'{name}{FORMATS[fmt]}')
+
+
+def _format_from_path(path: str) -> str:
+    for fmt, extension in FORMATS.items():
+        if path.endswith(extension):
+            return fmt
+    raise ValueError(f"format de dataset inconnu pour '{path}' (extensions : {list(FORMATS.values())})")
+
+
+def apply_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    applique le schéma : index datetime64[ns], features float32, label int8 en dernière colonne
+
+    Args :
+    - df (pd.DataFrame): dataset (avec ou sans colonne label)
+
+    Return:
+    - df (pd.DataFrame)
+    """
+    features = df.drop(columns=[LABEL_COLUMN], errors='ignore')
+    df_schema = pd.DataFrame(features.to_numpy(dtype=np.float32), columns=features.columns,
+                             index=pd.DatetimeIndex(pd.to_datetime(df.index), name=df.index.name or 'date'))
+
+    if LABEL_COLUMN in df.columns:
+        if df[LABEL_COLUMN].isna().any():
+            raise ValueError("la colonne label contient des valeurs manquantes, impossible de la stocker en int8")
+        df_schema[LABEL_COLUMN] = df[LABEL_COLUMN].to_numpy().astype(np.int8)
+    return df_schema
+
+
+def write_dataset(df: pd.DataFrame, path: str) -> str:
+    """
+    écrit un dataset au format déduit de l'extension (.parquet, .numpy ou .csv)
+
+    Args :
+    - df (pd.DataFrame): dataset indexé par date
+    - path (str): chemin de sortie
+
+    Return:
+    - path (str)
+    """
+    fmt = _format_from_path(path)
+    df = apply_schema(df)
+
+    if fmt == 'csv':
+        df.to_csv(path, index=True)
+    elif fmt == 'parquet':
+        df.to_parquet(path, index=True)
+    else:
+        # un fichier .npy par bloc de même dtype : chargeable en memory-map sans parsing
+        os.makedirs(path, exist_ok=True)
+        feature_columns = [col for col in df.columns if col != LABEL_COLUMN]
+        np.save(os.path.join(path, 'features.npy'), np.ascontiguousarray(df[feature_columns].to_numpy()))
+        np.save(os.path.join(path, 'index.npy'), df.index.to_numpy(dtype='datetime64[ns]'))
+        if LABEL_COLUMN in df.columns:
+            np.save(os.path.join(path, 'label.npy'), df[LABEL_COLUMN].to_numpy())
+        with open(os.path.join(path, 'schema.json'), 'w') as json_file:
+            json.dump({'index': df.index.name, 'features': feature_columns,
+                       'label': LABEL_COLUMN if LABEL_COLUMN in df.columns else None}, json_file, indent=1)
+    return path
+
+
+def read_dataset(path: str, mmap: bool = True, schema: bool = True) -> pd.DataFrame:
+    """
+    lit un dataset au format déduit de l'extension
+    pour le format numpy, le bloc de features est memory-mappé et n'est pas copié
+
+    Args :
+    - path (str): chemin du dataset
+    - mmap (bool): memory-map des fichiers (numpy, parquet)
+    - schema (bool): applique le schéma au csv (False : csv tel quel, features float64 dans l'ordre du fichier,
+                     comme à l'entraînement des modèles existants)
+
+    Return:
+    - df (pd.DataFrame): features float32 puis label int8, index datetime64[ns]
+    """
+    fmt = _format_from_path(path)
+
+    if fmt == 'csv':
+        df = pd.read_csv(path, index_col=0, parse_dates=True)
+        return apply_schema(df) if schema else df
+
+    if fmt == 'parquet':
+        return pd.read_parquet(path, memory_map=mmap)
+
+    with open(os.path.join(path, 'schema.json')) as json_file:
+        schema = json.load(json_file)
+    mmap_mode = 'r' if mmap else None
+    features = np.load(os.path.join(path, 'features.npy'), mmap_mode=mmap_mode)
+    index = pd.DatetimeIndex(np.load(os.path.join(path, 'index.npy')), name=schema['index'])
+
+    df = pd.DataFrame(features, columns=schema['features'], index=index, copy=False)
+    if schema['label'] is not None:
+        df[schema['label']] = np.load(os.path.join(path, 'label.npy'), mmap_mode=mmap_mode)
+    return df
+
+
+def read_dataset_any(data_dir: str, name: str, formats: tuple = ('numpy', 'parquet', 'csv'),
+                     schema: bool = True) -> pd.DataFrame:
+    """
+    lit le premier format disponible d'un dataset (les formats binaires avant le csv)
+    """
+    for fmt in formats:
+        path = dataset_path(data_dir, name, fmt)
+        if os.path.exists(path):
+            return read_dataset(path, schema=schema)
+    raise FileNotFoundError(f"aucun fichier pour le dataset '{name}' dans {data_dir} (formats : {formats})")
+
+
+def _size_bytes(path: str) -> int:
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+    return os.path.getsize(path)
+
+
+def compare_with_csv(csv_path: str, output_dir: str, repeat: int = 5) -> pd.DataFrame:
+    """
+    convertit un dataset csv en parquet et numpy et compare taille et temps de chargement
+
+    Args :
+    - csv_path (str): dataset csv existant
+    - output_dir (str): dossier des fichiers convertis
+    - repeat (int): nombre de chargements chronométrés (meilleur temps retenu)
+
+    Return:
+    - report (pd.DataFrame): taille (Mo), temps de chargement (ms) et gains par rapport au csv
+    """
+    df = pd.read_csv(csv_path, index_col=0, parse_dates=True)
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    os.makedirs(output_dir, exist_ok=True)
+
+    paths = {'csv': csv_path}
+    for fmt in ('parquet', 'numpy'):
+        paths[fmt] = write_dataset(df, dataset_path(output_dir, name, fmt))
+
+    rows = []
+    for fmt, path in paths.items():
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            if fmt == 'csv':
+                pd.read_csv(path, index_col=0, parse_dates=True)
+            else:
+                read_dataset(path)
+            timings.append(time.perf_counter() - start)
+        rows.append({'format': fmt, 'size_mb': _size_bytes(path) / 1e6, 'load_ms': min(timings) * 1e3})
+
+    report = pd.DataFrame(rows).set_index('format')
+    report['size_ratio'] = report.loc['csv', 'size_mb'] / report['size_mb']
+    report['speedup'] = report.loc['csv', 'load_ms'] / report['load_ms']
+    print(report.round(3))
+    return report
+
+
+if __name__ == '__main__':
+
+    # comparaison des formats sur les datasets du projet
+    for risk_profile in ('HRHP', 'LRLP'):
+        compare_with_csv(f'data/data_{risk_profile}.csv', output_dir='data')
@@ -1,7 +1,7 @@
 """
 @author: Louis Lebreton
 Scraping de posts X (Twitter)
-Export dans data/tweets/
+Export dans le store Parquet data/tweets/store/
 """
 import os
 import random
@@ -20,6 +20,10 @@ from selenium.webdriver.support.ui import WebDriverWait
 from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.support import expected_conditions as EC
 
+# page de recherche vide sans message "aucun résultat" (login raté, rate limit, page blanche) :
+# nombre de rechargements avant d'abandonner le compte sans avancer le checkpoint
+EMPTY_WINDOW_RETRIES = 2
+
 
 def tweets_parser(tweet_divs: list, tweets_scrap_dict:dict, tweets_data: list, account:str) -> tuple:
     """
@@ -72,11 +76,28 @@ def tweets_parser(tweet_divs: list, tweets_scrap_dict:dict, tweets_data: list, a
 
     return tweets_data, tweets_scrap_dict
 
-def scrape_tweets_one_account(username, password, account, since_date, until_date, driver)-> None:
+def incremental_since_date(since_date: datetime, latest_timestamp) -> datetime:
+    """
+    date de début du scraping d'un compte déjà présent dans le store :
+    jour du tweet le plus récent stocké (inclus, les doublons sont retirés par le store), au plus tôt since_date
+
+    Args :
+    - since_date : datetime : date la plus ancienne demandée
+    - latest_timestamp : pd.Timestamp | None : tweet le plus récent du compte dans le store (TweetStore.latest_timestamp)
+
+    Return : datetime
+    """
+    if latest_timestamp is None:
+        return since_date
+    latest_date = pd.Timestamp(latest_timestamp).tz_convert(None).normalize().to_pydatetime()
+    return max(since_date, latest_date)
+
+def scrape_tweets_one_account(username, password, account, since_date, until_date, driver, store, checkpoint=None)-> None:
     """
     fonction pour scraper les tweets d'un compte X
     dans une intervalle entre 2 dates (since_date to until_date)
-    export du df des tweets format csv dans data/tweets/{nom_du_compte}/
+    ajout des tweets de chaque fenêtre au store Parquet (partition du compte)
+    avec un checkpoint, le scraping reprend à la première fenêtre non terminée
 
     Args :
     - username : str : nom d'utilisateur pour la connexion Twitter
@@ -86,9 +107,15 @@ def scrape_tweets_one_account(username, password, account, since_date, until_dat
     - since_date : datetime : date de fin pour la collecte des tweets (la plus ancienne)
     - until_date : datetime : date de début pour la collecte des tweets (la plus récente)
     - driver : webdriver : instance de Selenium WebDriver 
+    - store : TweetStore : store Parquet consolidé des tweets
+    - checkpoint : ScrapingCheckpoint : curseur durable du compte (optionnel)
 
     Return : None
     """
+    if checkpoint is not None and checkpoint.done:
+        print(f'{account}: intervalle déjà scrapé (checkpoint {checkpoint.path})')
+        driver.quit()
+        return
 
     driver.get("https://twitter.com/login")
     time.sleep(random.uniform(3, 6))  # variabilité pour éviter la détection
@@ -115,7 +142,12 @@ def scrape_tweets_one_account(username, password, account, since_date, until_dat
 
         since_date_str = str(since_date).split(' ')[0]
         until_date_str = str(until_date).split(' ')[0]
+        if checkpoint is not None:
+            # reprise à la borne haute de la première fenêtre non terminée
+            until_date_str = checkpoint.cursor
+            print(f'{account}: reprise du scraping à {until_date_str}')
         last_tweet_date_str = until_date_str
+        empty_window_retries = 0
 
         while since_date_str != until_date_str:
             # target url (account + intervalle de date)
@@ -155,19 +187,35 @@ def scrape_tweets_one_account(username, password, account, since_date, until_dat
                 if tweets_scrap_dict == previous_tweets_scrap_dict:
                     print(f"{account}: fin du scrolling car arrivé en bas")
                     scrolling = False
+                    window_until_str = until_date_str
 
                     # df sans duplicates car risque de tweets plusieurs fois scrapés
                     tweets_df = pd.DataFrame(tweets_data).drop_duplicates('tweet_text', keep='last')
                     if not tweets_df.empty:
                         last_tweet_date_str = tweets_df['timestamp'].iloc[-1][:10]
                         until_date_str = last_tweet_date_str
+                        empty_window_retries = 0
+                    elif soup.find(attrs={'data-testid': 'emptyState'}) is not None:
+                        # "aucun résultat" affiché par X : plus rien à scraper avant until_date_str
+                        until_date_str = since_date_str
+                    elif empty_window_retries < EMPTY_WINDOW_RETRIES:
+                        # vide non confirmé : même fenêtre rechargée, checkpoint inchangé
+                        empty_window_retries += 1
+                        print(f'{account}: fenêtre vide non confirmée, nouvel essai {empty_window_retries}/{EMPTY_WINDOW_RETRIES}')
+                        continue
+                    else:
+                        # le checkpoint garde son curseur : la fenêtre sera reprise au prochain lancement
+                        raise RuntimeError(f'{account}: fenêtre {since_date_str} - {until_date_str} toujours vide '
+                                           f'sans confirmation, scraping interrompu')
                     
-                    # export dans un folder
-                    output_dir = f"data/tweets/{account}"
-                    if not os.path.exists(output_dir):
-                        os.makedirs(output_dir)
-                    print(f'{account}: export du df dans {output_dir}/tweets_data_{account}_{last_tweet_date_str}.csv')
-                    tweets_df.to_csv(f'{output_dir}/tweets_data_{account}_{last_tweet_date_str}.csv', index=False)
+                    # ajout au store (dédupliqué à l'écriture)
+                    n_new = store.append(account, tweets_df)
+                    print(f'{account}: {n_new} nouveaux tweets ajoutés au store {store.root}')
+
+                    # fenêtre terminée : le checkpoint n'avance qu'une fois les tweets écrits
+                    if checkpoint is not None:
+                        last_tweet_timestamp = tweets_df['timestamp'].iloc[-1] if not tweets_df.empty else None
+                        checkpoint.complete_window(since_date_str, window_until_str, until_date_str, last_tweet_timestamp)
 
                 previous_tweets_scrap_dict = tweets_scrap_dict
 
@@ -189,6 +237,11 @@ if __name__ == "__main__":
     since_date = datetime.strptime("2018-01-01", "%Y-%m-%d")
     until_date = datetime.strptime("2019-08-10", "%Y-%m-%d")
 
+    # store des tweets et checkpoints par compte
+    from services.df_building.tweets_store import TweetStore
+    from services.df_building.scraping_checkpoint import load_checkpoint
+    store = TweetStore()
+
     # comptes X à scraper
     accounts_list = ["woonomic", "100trillionUSD", "saylor", "documentingbtc", "LynAldenContact"]
 
@@ -199,9 +252,24 @@ if __name__ == "__main__":
     # avec ou sans visuel sur les pages webs
     # options.add_argument("--headless")
 
+    # tweet le plus récent de chaque compte déjà dans le store (mise à jour incrémentale)
+    latest_timestamps = store.latest_timestamps()
+
     # parallelisation
     with ThreadPoolExecutor(max_workers=2) as executor:
         for account in accounts_list:
+            checkpoint = load_checkpoint(account, str(since_date.date()), str(until_date.date()))
+            if checkpoint.done:
+                print(f'{account}: déjà scrapé, compte ignoré')
+                continue
+            account_since_date = since_date
+            if not checkpoint.completed_windows:
+                # pas de scraping interrompu à reprendre : seuls les tweets postérieurs au store sont scrapés
+                account_since_date = incremental_since_date(since_date, latest_timestamps.get(account))
+                if account_since_date >= until_date:
+                    print(f'{account}: store à jour jusqu\'à {account_since_date.date()}, compte ignoré')
+                    continue
+                checkpoint = load_checkpoint(account, str(account_since_date.date()), str(until_date.date()))
             driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
-            executor.submit(scrape_tweets_one_account, LOGIN, PASSWORD, account, since_date, until_date, driver)
+            executor.submit(scrape_tweets_one_account, LOGIN, PASSWORD, account, account_since_date, until_date, driver, store, checkpoint)
 
@@ -2,15 +2,45 @@
 @author: Louis Lebreton
 Genetic Algorithm optimization of TBM (Triple Barrier method) based on an equity strategy
 """
+import json
+import logging
+import os
+import pickle
+import queue
 import random
+import multiprocessing
+import time
 import numpy as np
+import pandas as pd
 from deap import base, creator, tools, algorithms
 from functools import partial
 from services.df_building.get_labels.triple_barrier_method import TripleBarrierMethod
 from services.df_building.get_labels.equity_strategy import EquityStrategy
+from services.df_building.get_labels import profiling
 
+logger = logging.getLogger(__name__)
 
-def evaluate_individual(individual, weight_p: float, weight_mdd: float, target_price )-> tuple:
+# search bound of the horizontal barriers: relative percentage change ('fixed')
+# or multiplier of the rolling volatility ('volatility')
+BARRIER_BOUNDS = {'fixed': 0.5, 'volatility': 5.0}
+
+# (profit, maximum drawdown) of unfeasible individuals in multi-objective mode:
+# dominated by every feasible individual, finite to keep the crowding distances defined
+UNFEASIBLE_OBJECTIVES = (-1e12, 1e12)
+
+
+def is_feasible(individual, barrier_mode: str = 'fixed') -> bool:
+    """
+    check the constraints on the 5 parameters of one individual
+    """
+    lower_barrier, upper_barrier, time_barrier, buy_number, sell_number = individual
+    bound = BARRIER_BOUNDS[barrier_mode]
+    return -bound < lower_barrier < 0 and 0 < upper_barrier < bound and 0 < buy_number < 0.001 and 0 < sell_number < 0.001 and 1 < time_barrier < 180
+
+
+@profiling.profiled()
+def evaluate_individual(individual, weight_p: float, weight_mdd: float, target_price, barrier_mode: str = 'fixed',
+                        high_price=None, low_price=None, tie_rule: str = 'lower')-> tuple:
     """
     evaluate one indivual (5 parameters).
     gives the fitness depending on the weight_p and weight_mdd.
@@ -19,16 +49,21 @@ def evaluate_individual(individual, weight_p: float, weight_mdd: float, target_p
     :individual: 5 parameters of one individual
     :weight_p: weight of profit
     :weight_mdd: weight of maximum drawdown
+    :barrier_mode: 'fixed' percentage barriers or 'volatility' multipliers
+    :high_price: optional highs (OHLC mode, with low_price)
+    :low_price: optional lows
+    :tie_rule: label of a bar touching both barriers in OHLC mode
     :return: fitness value (deap need a tuple as fitness value)
     """
     # one individual is 5 parameters
     lower_barrier, upper_barrier, time_barrier, buy_number, sell_number = individual 
     
     # constraints
-    if -0.5 < lower_barrier < 0 and 0 < upper_barrier < 0.5 and 0 < buy_number < 0.001 and 0 < sell_number < 0.001 and 1 < time_barrier < 180:
+    if is_feasible(individual, barrier_mode):
     
         # label using TBM
-        tbm = TripleBarrierMethod(target_price, lower_barrier=lower_barrier, upper_barrier=upper_barrier, time_barrier=int(time_barrier))
+        tbm = TripleBarrierMethod(target_price, lower_barrier=lower_barrier, upper_barrier=upper_barrier, time_barrier=int(time_barrier),
+                                  barrier_mode=barrier_mode, high_price=high_price, low_price=low_price, tie_rule=tie_rule)
         df_labeled = tbm.label_data()
         
         # compute fitness based on my equity strategy
@@ -39,70 +74,71 @@ def evaluate_individual(individual, weight_p: float, weight_mdd: float, target_p
         fitness = (0.0,)
 
     return fitness
-    
-
-def run_genetic_algorithm(toolbox, population_size, nb_gen, crossover, mutation) -> tuple:
-    """
-    execute genetic algorithm and return the best individual and its fitness
-    
-    :param toolbox: configured DEAP toolbox
-    :param population_size: population_size
-    :param nb_gen: nb of generations
-    :param crossover: crossover probability.
-    :param mutation: mutation probability.
-    :return: Tuple containing the best individual and its fitness.
-    """
-    # population creation
-    population = toolbox.population(n=population_size)
-    
-    for generation in range(nb_gen):
-        print(f"\n{'-'*40} Generation {generation + 1}/{nb_gen} {'-'*40}\n")
-        
-        offspring = algorithms.varAnd(population, toolbox, cxpb=crossover, mutpb=mutation)
-        fits = toolbox.map(toolbox.evaluate, offspring)
 
-        # evaluate individuals and assign fitness
-        for fit, ind in zip(fits, offspring):
-            ind.fitness.values = fit
-       
-        # next generation
-        population = toolbox.select(offspring, k=population_size)
 
-        # the best individual of the generation
-        best_individual = tools.selBest(population, k=1)[0]
-        best_fitness = best_individual.fitness.values[0]
-        print(f"\nBest individual of generation {generation + 1}: {np.array(best_individual)}")
-        print(f"Best fitness of generation {generation + 1}: {np.round(best_fitness, 2)}")
+@profiling.profiled()
+def evaluate_individual_objectives(individual, target_price, barrier_mode: str = 'fixed', high_price=None,
+                                   low_price=None, tie_rule: str = 'lower') -> tuple:
+    """
+    evaluate one individual on both objectives: profit (maximized) and maximum drawdown (minimized)
+    labeling and simulation are done once, any (weight_p, weight_mdd) fitness can be derived from the result
 
-    # best individual and its fitness
-    best_individual = tools.selBest(population, k=1)[0]
-    best_fitness = best_individual.fitness.values[0]
+    :target_price: time series of target prices to analyze
+    :individual: 5 parameters of one individual
+    :barrier_mode: 'fixed' percentage barriers or 'volatility' multipliers
+    :return: (profit, maximum drawdown)
+    """
+    lower_barrier, upper_barrier, time_barrier, buy_number, sell_number = individual
+    if not is_feasible(individual, barrier_mode):
+        return UNFEASIBLE_OBJECTIVES
 
-    return best_individual, best_fitness
+    tbm = TripleBarrierMethod(target_price, lower_barrier=lower_barrier, upper_barrier=upper_barrier, time_barrier=int(time_barrier),
+                              barrier_mode=barrier_mode, high_price=high_price, low_price=low_price, tie_rule=tie_rule)
+    equity_strategy = EquityStrategy(df=tbm.label_data(), buy_number=buy_number, sell_number=sell_number)
+    return (float(equity_strategy.calculate_profit()), float(equity_strategy.calculate_maximum_drawdown()))
 
-if __name__ == '__main__':
 
-    # test on a stock value
-    import yfinance as yf
-    data_daily = yf.download('AAPL', start='2020-01-01', end='2024-12-31', interval='1d')
-    target_price = data_daily['Close']
+def build_toolbox(target_price, weight_p: float = 0.5, weight_mdd: float = 0.5, barrier_mode: str = 'fixed',
+                  high_price=None, low_price=None, tie_rule: str = 'lower',
+                  multi_objective: bool = False) -> base.Toolbox:
+    """
+    build the DEAP toolbox used to optimize the TBM parameters of one risk profile
+    (creator classes are created once per process, so it can be called inside workers)
 
+    :target_price: time series of target prices to analyze
+    :weight_p: weight of profit
+    :weight_mdd: weight of maximum drawdown
+    :barrier_mode: 'fixed' searches raw percentages, 'volatility' searches volatility multipliers
+    :high_price: optional highs, the labels of the evaluation are OHLC labels (with low_price)
+    :low_price: optional lows
+    :tie_rule: label of a bar touching both barriers in OHLC mode
+    :multi_objective: NSGA-II toolbox maximizing profit and minimizing drawdown (weight_p / weight_mdd unused)
+    :return: configured DEAP toolbox
+    """
     # DEAP settings
-    creator.create("FitnessMax", base.Fitness, weights=(1.0,))  # goal : maximizing fitness value
-    creator.create("Individual", list, fitness=creator.FitnessMax) # individual lists definition
+    if not hasattr(creator, "FitnessMax"):
+        creator.create("FitnessMax", base.Fitness, weights=(1.0,))  # goal : maximizing fitness value
+    if not hasattr(creator, "Individual"):
+        creator.create("Individual", list, fitness=creator.FitnessMax) # individual lists definition
+    if not hasattr(creator, "FitnessMulti"):
+        creator.create("FitnessMulti", base.Fitness, weights=(1.0, -1.0))  # maximizing profit, minimizing mdd
+    if not hasattr(creator, "IndividualMulti"):
+        creator.create("IndividualMulti", list, fitness=creator.FitnessMulti)
+    individual_class = creator.IndividualMulti if multi_objective else creator.Individual
 
     # defining individuals and population
     toolbox = base.Toolbox()
 
     # defining constraints
-    toolbox.register("attr_lower_barrier", random.uniform, -0.5, 0)
-    toolbox.register("attr_upper_barrier", random.uniform, 0, 0.5)
+    bound = BARRIER_BOUNDS[barrier_mode]
+    toolbox.register("attr_lower_barrier", random.uniform, -bound, 0)
+    toolbox.register("attr_upper_barrier", random.uniform, 0, bound)
     toolbox.register("attr_time_barrier", random.randint, 1, 180)
     toolbox.register("attr_buy_number", random.uniform, 0, 0.001)
     toolbox.register("attr_sell_number", random.uniform, 0, 0.001)
 
     # defining creation of one individual
-    toolbox.register("individual", tools.initCycle, creator.Individual,
+    toolbox.register("individual", tools.initCycle, individual_class,
                     (toolbox.attr_lower_barrier,
                     toolbox.attr_upper_barrier,
                     toolbox.attr_time_barrier,
@@ -114,12 +150,337 @@ if __name__ == '__main__':
     toolbox.register("population", tools.initRepeat, list, toolbox.individual)
 
     # defining computation fitness function
-    toolbox.register("evaluate", partial(evaluate_individual, weight_p=0.7, weight_mdd=0.3))
+    labeling_parameters = {'target_price': target_price, 'barrier_mode': barrier_mode,
+                           'high_price': high_price, 'low_price': low_price, 'tie_rule': tie_rule}
+    if multi_objective:
+        toolbox.register("evaluate", partial(evaluate_individual_objectives, **labeling_parameters))
+    else:
+        toolbox.register("evaluate", partial(evaluate_individual, weight_p=weight_p, weight_mdd=weight_mdd,
+                                             **labeling_parameters))
 
     # defining genetic operations
     toolbox.register("mate", tools.cxBlend, alpha=0.5) # crossover / alpha : crossover variability
     toolbox.register("mutate", tools.mutGaussian, mu=0, sigma=1, indpb=0.2) # mutation / random draw in gaussian distribution
-    toolbox.register("select", tools.selTournament, tournsize=5) # selection / 5 individuals chosen
+    if multi_objective:
+        toolbox.register("select", tools.selNSGA2) # selection / non-dominated sorting + crowding distance
+    else:
+        toolbox.register("select", tools.selTournament, tournsize=5) # selection / 5 individuals chosen
+    return toolbox
+
+
+def evolve_generation(population, toolbox, population_size, crossover, mutation, surrogate=None,
+                      record: dict = None) -> list:
+    """
+    one generation: variation (crossover + mutation), evaluation of the offspring and selection
+    only offspring modified by the variation are evaluated, the others keep their fitness
+    (with a surrogate, the modified offspring it rejects are dropped before the selection)
+
+    :param population: current population
+    :param toolbox: configured DEAP toolbox
+    :param population_size: population_size
+    :param crossover: crossover probability.
+    :param mutation: mutation probability.
+    :param surrogate: optional SurrogateScreener pre-screening the offspring before the real evaluation
+    :param record: optional dict filled with the number of evaluations (n_evals) and their duration (eval_time)
+    :return: next population
+    """
+    with profiling.profile_block('deap.varAnd'):
+        offspring = algorithms.varAnd(population, toolbox, cxpb=crossover, mutpb=mutation)
+    invalid_individuals = [ind for ind in offspring if not ind.fitness.valid]
+    if surrogate is not None:
+        with profiling.profile_block('surrogate.screen'):
+            invalid_individuals = surrogate.screen(invalid_individuals)
+        # offspring rejected by the surrogate have no real fitness: they do not take part in the selection
+        screened = {id(ind) for ind in invalid_individuals}
+        offspring = [ind for ind in offspring if ind.fitness.valid or id(ind) in screened]
+    start = time.perf_counter()
+
+    # evaluate individuals and assign fitness
+    with profiling.profile_block('toolbox.map(evaluate)'):
+        fits = toolbox.map(toolbox.evaluate, invalid_individuals)
+        for fit, ind in zip(fits, invalid_individuals):
+            ind.fitness.values = fit
+    if record is not None:
+        record['n_evals'] = len(invalid_individuals)
+        record['eval_time'] = time.perf_counter() - start
+    if surrogate is not None:
+        surrogate.record(invalid_individuals)
+
+    # next generation
+    with profiling.profile_block('deap.select'):
+        return toolbox.select(offspring, k=population_size)
+
+
+def save_checkpoint(path: str, population, generation: int, halloffame=None, logbook=None, surrogate=None) -> None:
+    """
+    save the state of a GA run (population with fitnesses, generation, RNG states, hall of fame, stats)
+    the file is written next to its destination and renamed, an interruption never leaves a truncated checkpoint
+    """
+    checkpoint = {'population': population, 'generation': generation,
+                  'random_state': random.getstate(), 'numpy_random_state': np.random.get_state(),
+                  'halloffame': list(halloffame) if halloffame is not None else None,
+                  'logbook': logbook, 'surrogate': surrogate}
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(checkpoint, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path: str) -> dict:
+    """
+    load a GA checkpoint (the DEAP creator classes must exist: build the toolbox first)
+    """
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def run_genetic_algorithm(toolbox, population_size, nb_gen, crossover, mutation, surrogate=None,
+                          halloffame=None, checkpoint_path: str = None, checkpoint_interval: int = 1,
+                          resume_from: str = None, log_path: str = None) -> tuple:
+    """
+    execute genetic algorithm and return the best individual and its fitness
+    per generation stats (min / mean / max fitness, evaluations, eval time, evals/sec) are logged as json
+    
+    :param toolbox: configured DEAP toolbox
+    :param population_size: population_size
+    :param nb_gen: nb of generations
+    :param crossover: crossover probability.
+    :param mutation: mutation probability.
+    :param surrogate: optional SurrogateScreener pre-screening the offspring before the real evaluation
+    :param halloffame: optional tools.HallOfFame updated every generation
+    :param checkpoint_path: file of the checkpoint saved every checkpoint_interval generations and at the end
+    :param checkpoint_interval: nb of generations between two checkpoints (>= 1)
+    :param resume_from: checkpoint to resume from (population, generation, RNG states, hall of fame)
+    :param log_path: optional file receiving the json stats of every generation
+    with profiling enabled (TBM_PROFILE=1 or profiling.profiling()), a table of the calls and wall time
+    of the hot functions is printed at the end (and one cProfile dump per generation with TBM_PROFILE_DIR)
+    :return: Tuple containing the best individual and its fitness.
+    """
+    if checkpoint_interval < 1:
+        raise ValueError(f"checkpoint_interval must be >= 1 (got {checkpoint_interval})")
+    logbook = tools.Logbook()
+    if resume_from is not None:
+        checkpoint = load_checkpoint(resume_from)
+        population, start_generation = checkpoint['population'], checkpoint['generation']
+        random.setstate(checkpoint['random_state'])
+        np.random.set_state(checkpoint['numpy_random_state'])
+        logbook = checkpoint['logbook'] or logbook
+        if halloffame is not None and checkpoint['halloffame'] is not None:
+            halloffame.clear()
+            halloffame.update(checkpoint['halloffame'])
+        if surrogate is not None and checkpoint['surrogate'] is not None:
+            surrogate.__dict__.update(checkpoint['surrogate'].__dict__)
+        logger.info(f"resuming from '{resume_from}' at generation {start_generation + 1}/{nb_gen}")
+    else:
+        # population creation
+        population = toolbox.population(n=population_size)
+        start_generation = 0
+
+    handler, previous_level = None, logger.level
+    if log_path is not None:
+        os.makedirs(os.path.dirname(log_path) or '.', exist_ok=True)
+        handler = logging.FileHandler(log_path)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+
+    try:
+        for generation in range(start_generation, nb_gen):
+            record = {'gen': generation + 1}
+            with profiling.generation_profile(generation + 1):
+                population = evolve_generation(population, toolbox, population_size, crossover, mutation, surrogate,
+                                               record=record)
+            if halloffame is not None:
+                halloffame.update(population)
+
+            # the best individual of the generation and the stats of the population
+            best_individual = tools.selBest(population, k=1)[0]
+            fitnesses = np.array([ind.fitness.values[0] for ind in population])
+            record.update(min=float(fitnesses.min()), mean=float(fitnesses.mean()),
+                          max=float(fitnesses.max()), best_individual=[float(gene) for gene in best_individual],
+                          evals_per_sec=record['n_evals'] / record['eval_time'] if record['eval_time'] else 0.0)
+            logbook.record(**record)
+            logger.info(json.dumps(record))
+
+            if checkpoint_path is not None and ((generation + 1) % checkpoint_interval == 0 or generation + 1 == nb_gen):
+                save_checkpoint(checkpoint_path, population, generation + 1, halloffame, logbook, surrogate)
+    finally:
+        if handler is not None:
+            logger.removeHandler(handler)
+            logger.setLevel(previous_level)
+            handler.close()
+
+    # best individual and its fitness
+    best_individual = tools.selBest(population, k=1)[0]
+    best_fitness = best_individual.fitness.values[0]
+
+    if surrogate is not None:
+        print(surrogate.summary())
+    if profiling.is_enabled():
+        print(profiling.summary_table())
+
+    return best_individual, best_fitness
+
+
+def run_nsga2(toolbox, population_size, nb_gen, crossover, mutation) -> tools.ParetoFront:
+    """
+    execute the NSGA-II search on (profit, maximum drawdown) and return the Pareto front
+    parents and offspring compete together in the selection (elitist mu + lambda)
+
+    :param toolbox: DEAP toolbox built with multi_objective=True
+    :param population_size: population_size
+    :param nb_gen: nb of generations
+    :param crossover: crossover probability.
+    :param mutation: mutation probability.
+    :return: Pareto front of every individual evaluated
+    """
+    front = tools.ParetoFront()
+    population = toolbox.population(n=population_size)
+    for ind, fit in zip(population, toolbox.map(toolbox.evaluate, population)):
+        ind.fitness.values = fit
+    population = toolbox.select(population, k=population_size)  # assigns the crowding distances
+    front.update(population)
+
+    for generation in range(nb_gen):
+        offspring = algorithms.varAnd(population, toolbox, cxpb=crossover, mutpb=mutation)
+        invalid_individuals = [ind for ind in offspring if not ind.fitness.valid]
+        for ind, fit in zip(invalid_individuals, toolbox.map(toolbox.evaluate, invalid_individuals)):
+            ind.fitness.values = fit
+
+        population = toolbox.select(population + offspring, k=population_size)
+        front.update(population)
+        profits = [ind.fitness.values[0] for ind in front]
+        logger.info(json.dumps({'gen': generation + 1, 'n_evals': len(invalid_individuals), 'front_size': len(front),
+                                'min_profit': float(min(profits)), 'max_profit': float(max(profits))}))
+
+    return front
+
+
+def pareto_table(front) -> pd.DataFrame:
+    """
+    feasible individuals of a Pareto front as a df (parameters, profit and maximum drawdown)
+    """
+    rows = [{'lower_barrier': ind[0], 'upper_barrier': ind[1], 'time_barrier': int(ind[2]),
+             'buy_number': ind[3], 'sell_number': ind[4],
+             'profit': ind.fitness.values[0], 'mdd': ind.fitness.values[1]}
+            for ind in front if ind.fitness.values != UNFEASIBLE_OBJECTIVES]
+    return pd.DataFrame(rows)
+
+
+def select_from_front(df_front: pd.DataFrame, weight_p: float, weight_mdd: float) -> tuple:
+    """
+    pick the individual of the Pareto front maximizing weight_p * profit - weight_mdd * mdd
+    (the fitness of the single objective GA for the same weights)
+
+    :param df_front: Pareto front from pareto_table
+    :param weight_p: weight of profit
+    :param weight_mdd: weight of maximum drawdown
+    :return: Tuple containing the best individual (5 parameters) and its fitness
+    """
+    if df_front.empty:
+        raise ValueError("the Pareto front has no feasible individual: increase population_size / nb_gen "
+                         "or widen the barrier ranges")
+    fitness = weight_p * df_front['profit'] - weight_mdd * df_front['mdd']
+    best = df_front.loc[fitness.idxmax()]
+    best_individual = [best['lower_barrier'], best['upper_barrier'], int(best['time_barrier']),
+                       best['buy_number'], best['sell_number']]
+    return best_individual, float(fitness.max())
+
+
+def _island_worker(island_id, toolbox_factory, population_size, nb_gen, crossover, mutation,
+                   migration_interval, migration_size, seed, inbox, outbox, results) -> None:
+    """
+    evolve one island and exchange its best individuals with the next island of the ring
+    migrants travel as (genes, fitness values) so that any process can rebuild them
+    """
+    random.seed(seed + island_id)
+    np.random.seed(seed + island_id)
+    toolbox = toolbox_factory()
+    population = toolbox.population(n=population_size)
+    best_fitness_curve = []
+
+    for generation in range(nb_gen):
+        population = evolve_generation(population, toolbox, population_size, crossover, mutation)
+        best_fitness_curve.append(tools.selBest(population, k=1)[0].fitness.values[0])
+
+        # migration: send the best individuals, replace the worst ones by the immigrants
+        # (blocking exchange at fixed generations keeps runs reproducible for a given seed)
+        if (generation + 1) % migration_interval == 0 and generation + 1 < nb_gen:
+            outbox.put([(list(ind), ind.fitness.values) for ind in tools.selBest(population, k=migration_size)])
+            immigrants = []
+            for genes, fitness_values in inbox.get():
+                immigrant = creator.Individual(genes)
+                immigrant.fitness.values = fitness_values
+                immigrants.append(immigrant)
+            population = tools.selBest(population, k=population_size - len(immigrants)) + immigrants
+
+    best_individual = tools.selBest(population, k=1)[0]
+    results.put((island_id, list(best_individual), best_individual.fitness.values[0], best_fitness_curve))
+
+
+def run_island_genetic_algorithm(toolbox_factory, n_islands, population_size, nb_gen, crossover, mutation,
+                                 migration_interval=5, migration_size=2, seed=999, poll_interval=1.0) -> tuple:
+    """
+    island model: n_islands sub-populations evolve in separate processes (varAnd / selTournament locally)
+    and every migration_interval generations each island sends its best individuals to the next one (ring)
+
+    :param toolbox_factory: picklable callable returning a configured DEAP toolbox (ex: partial(build_toolbox, ...))
+    :param n_islands: number of islands (processes)
+    :param population_size: population size of each island
+    :param nb_gen: nb of generations
+    :param crossover: crossover probability.
+    :param mutation: mutation probability.
+    :param migration_interval: nb of generations between two migrations
+    :param migration_size: nb of individuals sent by each island at each migration
+    :param seed: base seed, island i uses seed + i
+    :param poll_interval: seconds between two checks of the island processes while waiting for their results
+    :return: Tuple containing the best individual (genes), its fitness and the best fitness curve of each island
+    """
+    queues = [multiprocessing.Queue() for _ in range(n_islands)]
+    results = multiprocessing.Queue()
+    islands = [multiprocessing.Process(target=_island_worker,
+                                       args=(island_id, toolbox_factory, population_size, nb_gen, crossover, mutation,
+                                             migration_interval, migration_size, seed,
+                                             queues[island_id], queues[(island_id + 1) % n_islands], results))
+               for island_id in range(n_islands)]
+    for island in islands:
+        island.start()
+
+    # a dead island would block the parent and its neighbours (inbox.get) forever: stop every island
+    island_results = []
+    while len(island_results) < n_islands:
+        try:
+            island_results.append(results.get(timeout=poll_interval))
+        except queue.Empty:
+            failed = {island_id: island.exitcode for island_id, island in enumerate(islands)
+                      if island.exitcode not in (None, 0)}
+            if failed:
+                for island in islands:
+                    if island.is_alive():
+                        island.terminate()
+                    island.join()
+                raise RuntimeError(f"island process(es) failed (island: exit code): {failed}")
+    island_results.sort()
+    for island in islands:
+        island.join()
+
+    # best fitness curves per island
+    curves = {island_id: curve for island_id, _, _, curve in island_results}
+    for island_id, curve in curves.items():
+        logger.info(json.dumps({'island': island_id, 'best_fitness_curve': np.round(curve, 2).tolist()}))
+
+    _, best_individual, best_fitness, _ = max(island_results, key=lambda result: result[2])
+    return best_individual, float(best_fitness), curves
+
+if __name__ == '__main__':
+
+    # test on a stock value
+    import yfinance as yf
+    data_daily = yf.download('AAPL', start='2020-01-01', end='2024-12-31', interval='1d')
+    target_price = data_daily['Close']
+
+    toolbox = build_toolbox(target_price, weight_p=0.7, weight_mdd=0.3)
 
     best_individual, best_fitness = run_genetic_algorithm(toolbox, population_size= 50, nb_gen=5, crossover=0.7, mutation=0.2)
 
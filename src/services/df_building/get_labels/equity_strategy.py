@@ -2,9 +2,10 @@
 @author: Louis Lebreton
 Equity Strategy
 """
-import numpy as np
 import pandas as pd
 from dataclasses import dataclass, field
+from services.df_building.get_labels import portfolio_analytics
+from services.df_building.get_labels.profiling import profiled
 
 @dataclass
 class EquityStrategy:
@@ -37,6 +38,7 @@ class EquityStrategy:
         if self.df is not None:
             self.buy_and_sell()
 
+    @profiled()
     def buy_and_sell(self) -> None:
         """
         function that buys and sells shares
@@ -75,9 +77,7 @@ class EquityStrategy:
         :equity_curve: list or pandas series containing equity values over time
         :return: total profit
         """
-        initial_equity = self.equity_curve.iloc[0]
-        final_equity = self.equity_curve.iloc[-1]
-        return final_equity - initial_equity
+        return portfolio_analytics.calculate_profit(self.equity_curve.to_numpy())[0]
 
     def calculate_maximum_drawdown(self) -> float:
         """
@@ -85,11 +85,9 @@ class EquityStrategy:
         :equity_curve: list or pandas series containing equity values over time
         :return: value of maximum drawdown
         """
-        peak = self.equity_curve.cummax()
-        drawdown = self.equity_curve - peak
-        max_drawdown = drawdown.min()
-        return abs(max_drawdown)
+        return portfolio_analytics.calculate_maximum_drawdown(self.equity_curve.to_numpy())[0]
 
+    @profiled()
     def fitness_function(self, weight_p: float = 0.5, weight_mdd: float = 0.5) -> float:
         """
         fitness function combining profit and maximum drawdown
@@ -108,23 +106,26 @@ class EquityStrategy:
         :param annual_risk_free_rate: risk-free rate used in the sharpe ratio calculation (default is 0.0).
         :return: sharpe ratio value
         """
-       
-        daily_returns = self.equity_curve.pct_change().dropna()
-        mean_return = daily_returns.mean()
-        std_dev_return = daily_returns.std()
+        return portfolio_analytics.calculate_sharpe_ratio(self.equity_curve.to_numpy(),
+                                                          annual_risk_free_rate=annual_risk_free_rate)[0]
 
-        if std_dev_return == 0:
-            return 0.0 
-
-        daily_risk_free_rate = annual_risk_free_rate / 365
+    def calculate_analytics(self, annual_risk_free_rate: float = 0.0) -> dict:
+        """
+        calculates every analytic of the equity curve in one pass
+        (profit, max_drawdown, drawdown_duration, sharpe, sortino, calmar)
 
-        sharpe_ratio_annualized = ((mean_return - daily_risk_free_rate) 
-                                / std_dev_return) * np.sqrt(365)
-        return sharpe_ratio_annualized
+        :param annual_risk_free_rate: risk-free rate used in the sharpe and sortino ratios
+        :return: dict of analytics values
+        """
+        analytics = portfolio_analytics.compute_analytics(self.equity_curve.to_numpy(),
+                                                          annual_risk_free_rate=annual_risk_free_rate)
+        return {name: values[0] for name, values in analytics.items()}
 
 if __name__ == '__main__':
 
-    df_tbm_trading_strategy = pd.read_csv('data/df_tbm_trading_strategy.csv')
+    from services.df_building.dataset_io import read_dataset
+
+    df_tbm_trading_strategy = read_dataset('data/df_tbm_trading_strategy.csv')
     predicted_labels_equity_strategy = EquityStrategy(df=df_tbm_trading_strategy, 
                                      buy_number=0.001,
                                      sell_number=0.0009, 
@@ -0,0 +1,147 @@
+"""
+@author: Louis Lebreton
+Vectorized portfolio analytics over a matrix of equity curves
+every function takes an (N, T) matrix (one equity curve per row, rows may be right-padded with NaN)
+and returns one value per row
+"""
+import warnings
+
+import numpy as np
+
+
+def _as_matrix(equity) -> np.ndarray:
+    """
+    convert one equity curve (T,) or a matrix of equity curves (N, T) to a float64 (N, T) matrix
+    """
+    equity = np.asarray(equity, dtype=np.float64)
+    return equity[np.newaxis, :] if equity.ndim == 1 else equity
+
+
+def _first_valid_index(equity: np.ndarray) -> np.ndarray:
+    """
+    position of the first non NaN value of each row
+    """
+    return np.argmax(~np.isnan(equity), axis=1)
+
+
+def _last_valid_index(equity: np.ndarray) -> np.ndarray:
+    """
+    position of the last non NaN value of each row (NaN inside a row are skipped, not counted)
+    """
+    return equity.shape[1] - 1 - np.argmax(~np.isnan(equity[:, ::-1]), axis=1)
+
+
+def _last_valid(equity: np.ndarray) -> np.ndarray:
+    """
+    last non NaN value of each row
+    """
+    return equity[np.arange(len(equity)), _last_valid_index(equity)]
+
+
+def _returns(equity: np.ndarray) -> np.ndarray:
+    """
+    simple returns between consecutive steps (NaN where undefined, like pct_change().dropna())
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return equity[:, 1:] / equity[:, :-1] - 1
+
+
+def _drawdowns(equity: np.ndarray, peak: np.ndarray) -> tuple:
+    """
+    maximum drawdown and longest number of steps spent below a previous peak
+    """
+    drawdown = equity - peak
+    max_drawdown = np.abs(np.nanmin(drawdown, axis=1))
+
+    # duration: steps since the last peak, reset each time a new peak is reached
+    steps = np.broadcast_to(np.arange(equity.shape[1]), equity.shape)
+    last_peak = np.maximum.accumulate(np.where(drawdown >= 0, steps, 0), axis=1)
+    duration = np.where(np.isnan(equity), 0, steps - last_peak).max(axis=1)
+    return max_drawdown, duration
+
+
+def _sharpe(returns: np.ndarray, annual_risk_free_rate: float, periods_per_year: int) -> np.ndarray:
+    mean_return = np.nanmean(returns, axis=1)
+    std_return = np.nanstd(returns, axis=1, ddof=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = (mean_return - annual_risk_free_rate / periods_per_year) / std_return * np.sqrt(periods_per_year)
+    return np.where(std_return == 0, 0.0, sharpe)
+
+
+def _sortino(returns: np.ndarray, annual_risk_free_rate: float, periods_per_year: int) -> np.ndarray:
+    excess = returns - annual_risk_free_rate / periods_per_year
+    downside = np.sqrt(np.nanmean(np.minimum(excess, 0) ** 2, axis=1))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sortino = np.nanmean(excess, axis=1) / downside * np.sqrt(periods_per_year)
+    return np.where(downside == 0, 0.0, sortino)
+
+
+def _calmar(equity: np.ndarray, peak: np.ndarray, periods_per_year: int) -> np.ndarray:
+    n_steps = _last_valid_index(equity) - _first_valid_index(equity)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        max_drawdown_pct = np.abs(np.nanmin(equity / peak - 1, axis=1))
+        annual_return = (_last_valid(equity) / equity[:, 0]) ** (periods_per_year / n_steps) - 1
+        calmar = annual_return / max_drawdown_pct
+    return np.where((max_drawdown_pct == 0) | ~np.isfinite(calmar), 0.0, calmar)
+
+
+def calculate_profit(equity) -> np.ndarray:
+    """
+    total profit of each equity curve
+
+    :param equity: (N, T) matrix of equity curves
+    :return: (N,) profits
+    """
+    equity = _as_matrix(equity)
+    return _last_valid(equity) - equity[:, 0]
+
+
+def calculate_maximum_drawdown(equity) -> np.ndarray:
+    """
+    maximum drawdown (MDD) of each equity curve
+
+    :param equity: (N, T) matrix of equity curves
+    :return: (N,) maximum drawdowns (positive values)
+    """
+    equity = _as_matrix(equity)
+    return _drawdowns(equity, np.fmax.accumulate(equity, axis=1))[0]
+
+
+def calculate_sharpe_ratio(equity, annual_risk_free_rate: float = 0.0, periods_per_year: int = 365) -> np.ndarray:
+    """
+    annualized sharpe ratio of each equity curve (0 when returns have no volatility)
+
+    :param equity: (N, T) matrix of equity curves
+    :param annual_risk_free_rate: risk-free rate used in the sharpe ratio calculation
+    :param periods_per_year: number of steps per year
+    :return: (N,) sharpe ratios
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return _sharpe(_returns(_as_matrix(equity)), annual_risk_free_rate, periods_per_year)
+
+
+def compute_analytics(equity, annual_risk_free_rate: float = 0.0, periods_per_year: int = 365) -> dict:
+    """
+    every analytic of every equity curve, sharing the running peak and the returns
+
+    :param equity: (N, T) matrix of equity curves
+    :param annual_risk_free_rate: risk-free rate used in the sharpe and sortino ratios
+    :param periods_per_year: number of steps per year
+    :return: dict of (N,) arrays: profit, max_drawdown, drawdown_duration, sharpe, sortino, calmar
+    """
+    equity = _as_matrix(equity)
+    peak = np.fmax.accumulate(equity, axis=1)
+    returns = _returns(equity)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        max_drawdown, drawdown_duration = _drawdowns(equity, peak)
+        return {
+            'profit': _last_valid(equity) - equity[:, 0],
+            'max_drawdown': max_drawdown,
+            'drawdown_duration': drawdown_duration,
+            'sharpe': _sharpe(returns, annual_risk_free_rate, periods_per_year),
+            'sortino': _sortino(returns, annual_risk_free_rate, periods_per_year),
+            'calmar': _calmar(equity, peak, periods_per_year),
+        }
@@ -0,0 +1,121 @@
+"""
+@author: Louis Lebreton
+Opt-in profiling of the labeling, equity simulation and GA hot paths
+enabled by the TBM_PROFILE=1 environment variable or the profiling() context manager,
+TBM_PROFILE_DIR (or profiling(cprofile_dir=...)) adds one cProfile dump per GA generation
+disabled, a profiled function costs one flag check
+"""
+import cProfile
+import functools
+import os
+import time
+from contextlib import contextmanager
+
+_enabled = os.getenv('TBM_PROFILE', '0') not in ('', '0')
+_cprofile_dir = os.getenv('TBM_PROFILE_DIR') or None
+
+# name -> [number of calls, total wall time (s)], accumulated in the current process
+# (evaluations run by a multiprocessing toolbox.map are counted in the workers, not here)
+_stats = {}
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def reset_stats() -> None:
+    _stats.clear()
+
+
+def record(name: str, duration: float) -> None:
+    stat = _stats.setdefault(name, [0, 0.0])
+    stat[0] += 1
+    stat[1] += duration
+
+
+@contextmanager
+def profiling(cprofile_dir: str = None, reset: bool = True):
+    """
+    enable profiling inside the block
+
+    :param cprofile_dir: optional directory of the per generation cProfile dumps
+    :param reset: clear the stats accumulated before
+    """
+    global _enabled, _cprofile_dir
+    previous = _enabled, _cprofile_dir
+    if reset:
+        reset_stats()
+    _enabled, _cprofile_dir = True, cprofile_dir or _cprofile_dir
+    try:
+        yield _stats
+    finally:
+        _enabled, _cprofile_dir = previous
+
+
+def profiled(name: str = None):
+    """
+    decorator accumulating the calls and wall time of a function when profiling is enabled
+
+    :param name: name in the summary table (default: qualified name of the function)
+    """
+    def decorator(func):
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(label, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def profile_block(name: str):
+    """
+    accumulate the wall time of a code block (ex: DEAP operators) when profiling is enabled
+    """
+    if not _enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+@contextmanager
+def generation_profile(generation: int):
+    """
+    cProfile dump of one GA generation (generation_XXX.prof, readable with pstats or snakeviz)
+    when profiling is enabled with a cProfile directory
+    """
+    if not (_enabled and _cprofile_dir):
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        os.makedirs(_cprofile_dir, exist_ok=True)
+        profiler.dump_stats(os.path.join(_cprofile_dir, f'generation_{generation:03d}.prof'))
+
+
+def summary_table() -> str:
+    """
+    calls, total and mean wall time of every profiled function, slowest first
+    (times are inclusive: evaluate_individual contains label_data and buy_and_sell)
+    """
+    rows = sorted(_stats.items(), key=lambda item: -item[1][1])
+    width = max([len(name) for name, _ in rows] + [8])
+    lines = [f"{'function':<{width}} {'calls':>9} {'total (s)':>10} {'mean (ms)':>10}"]
+    for name, (calls, total) in rows:
+        lines.append(f"{name:<{width}} {calls:>9} {total:>10.3f} {1e3 * total / calls:>10.3f}")
+    return '\n'.join(lines)
@@ -0,0 +1,113 @@
+"""
+@author: Louis Lebreton
+Surrogate-assisted pre-screening of GA offspring
+a cheap regressor fitted on every (genome, fitness) pair evaluated so far predicts the fitness of the offspring,
+only the most promising ones (plus an exploration quota) go to the expensive TBM + equity evaluation,
+the others are discarded before the selection
+"""
+import math
+import random
+import numpy as np
+from dataclasses import dataclass, field
+from sklearn.ensemble import RandomForestRegressor
+
+
+@dataclass
+class SurrogateScreener:
+    """
+    pre-screens offspring with a random forest trained on the real evaluations
+
+    Attributes:
+        screening_ratio: fraction of the offspring with the best predicted fitness sent to the real evaluator
+        exploration_ratio: fraction of the offspring drawn at random among the others and evaluated anyway
+        min_samples: number of real evaluations needed before screening starts
+        n_estimators: number of trees of the surrogate
+        genomes: genomes evaluated so far
+        fitnesses: real fitness of the evaluated genomes
+        n_real: number of real evaluations
+        n_avoided: number of real evaluations avoided
+    """
+    screening_ratio: float = 0.3
+    exploration_ratio: float = 0.1
+    min_samples: int = 30
+    n_estimators: int = 50
+    genomes: list = field(default_factory=list)
+    fitnesses: list = field(default_factory=list)
+    n_real: int = 0
+    n_avoided: int = 0
+
+    def record(self, individuals) -> None:
+        """
+        store the real fitness of freshly evaluated individuals
+        """
+        for ind in individuals:
+            self.genomes.append(list(ind))
+            self.fitnesses.append(ind.fitness.values[0])
+        self.n_real += len(individuals)
+
+    def screen(self, individuals) -> list:
+        """
+        keep the individuals worth a real evaluation
+        rejected individuals keep an invalid fitness: they are never given a made-up one
+        (the caller drops them before the selection, see evolve_generation)
+
+        :param individuals: offspring without a valid fitness
+        :return: individuals to evaluate
+        """
+        if len(self.fitnesses) < self.min_samples or not individuals:
+            return individuals
+
+        model = RandomForestRegressor(n_estimators=self.n_estimators, random_state=len(self.fitnesses), n_jobs=1)
+        model.fit(np.asarray(self.genomes), np.asarray(self.fitnesses))
+        predictions = model.predict(np.asarray([list(ind) for ind in individuals]))
+
+        order = np.argsort(-predictions)
+        n_top = math.ceil(self.screening_ratio * len(individuals))
+        rest = order[n_top:].tolist()
+        explored = random.sample(rest, min(len(rest), math.ceil(self.exploration_ratio * len(individuals))))
+        selected = set(order[:n_top].tolist()) | set(explored)
+
+        self.n_avoided += len(individuals) - len(selected)
+        return [ind for i, ind in enumerate(individuals) if i in selected]
+
+    def summary(self) -> str:
+        total = self.n_real + self.n_avoided
+        share = 100 * self.n_avoided / total if total else 0.0
+        return f"surrogate: {self.n_real} real evaluations, {self.n_avoided} avoided ({share:.1f}%)"
+
+
+def compare_with_unassisted(toolbox, population_size, nb_gen, crossover, mutation, seed=999, **screener_parameters) -> dict:
+    """
+    run the GA with and without surrogate from the same seed and compare best fitness and real evaluations
+
+    :param toolbox: configured DEAP toolbox
+    :param screener_parameters: parameters of the SurrogateScreener
+    :return: dict with the best fitness and the number of real evaluations of both runs
+    """
+    from services.df_building.get_labels.GA_optimization import run_genetic_algorithm
+
+    evaluate = toolbox.evaluate
+    n_calls = {'count': 0}
+
+    def counted_evaluate(individual):
+        n_calls['count'] += 1
+        return evaluate(individual)
+
+    toolbox.register("evaluate", counted_evaluate)
+    comparison = {}
+    try:
+        for name, surrogate in (('unassisted', None), ('assisted', SurrogateScreener(**screener_parameters))):
+            random.seed(seed)
+            np.random.seed(seed)
+            n_calls['count'] = 0
+            _, best_fitness = run_genetic_algorithm(toolbox, population_size, nb_gen, crossover, mutation,
+                                                    surrogate=surrogate)
+            comparison[name] = {'best_fitness': best_fitness, 'real_evaluations': n_calls['count']}
+    finally:
+        toolbox.register("evaluate", evaluate)
+
+    print(f"unassisted GA: best fitness {comparison['unassisted']['best_fitness']:.2f} "
+          f"with {comparison['unassisted']['real_evaluations']} real evaluations")
+    print(f"assisted GA:   best fitness {comparison['assisted']['best_fitness']:.2f} "
+          f"with {comparison['assisted']['real_evaluations']} real evaluations")
+    return comparison
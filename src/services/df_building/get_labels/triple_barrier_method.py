@@ -8,6 +8,189 @@ import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 import matplotlib.lines as mlines
 from dataclasses import dataclass, field
+from services.df_building.get_labels.profiling import profiled
+
+# label given when the upper and the lower barriers are touched at the same step
+TIE_RULES = {'lower': -1, 'upper': 1, 'hold': 0}
+
+# barrier hit codes of the event table
+BARRIER_HITS = {1: 'upper', -1: 'lower', 0: 'vertical', 2: 'both'}
+
+
+@profiled()
+def first_touch_labels(prices: np.ndarray, upper_prices: np.ndarray, lower_prices: np.ndarray,
+                       time_barrier, high_prices: np.ndarray = None, low_prices: np.ndarray = None,
+                       tie_rule: str = 'lower', return_events: bool = False):
+    """
+    vectorized first-touch search of the barriers
+
+    the loop runs over the time_barrier horizons and compares all the still untouched steps at once,
+    steps are dropped as soon as one barrier is touched, so the python work is O(time_barrier)
+    and the numpy work shrinks with the number of unresolved windows
+    a (n, m) panel is searched in the same pass: every (step, asset) pair is one window
+    NaN prices never touch a barrier and NaN barrier prices are never touched (label 0)
+    with high_prices / low_prices (OHLC mode) the upper barrier is tested against the highs
+    and the lower barrier against the lows, so intrabar touches are caught
+
+    :param prices: (n,) prices or (n, m) panel of prices (one column per asset)
+    :param upper_prices: upper barrier price of each starting step, same shape as prices
+    :param lower_prices: lower barrier price of each starting step, same shape as prices
+    :param time_barrier: time limit (in terms of steps), int or (m,) per asset time limits
+    :param high_prices: highs tested against the upper barrier (default: prices)
+    :param low_prices: lows tested against the lower barrier (default: prices)
+    :param tie_rule: label when both barriers are touched at the same step: 'lower' (-1), 'upper' (1) or 'hold' (0)
+    :param return_events: also return the touch step and the barrier hit of every window
+    :return: int8 labels with the shape of prices (1 upper barrier first, -1 lower barrier first, 0 none)
+             with return_events, (labels, touches, hits): touches are the steps of the first touch
+             (time barrier step if none, -1 for incomplete windows) and hits the BARRIER_HITS codes
+    """
+    if tie_rule not in TIE_RULES:
+        raise ValueError(f"unknown tie_rule '{tie_rule}', expected one of {list(TIE_RULES)}")
+
+    shape = np.shape(prices)
+    n = shape[0]
+    m = int(np.prod(shape[1:], dtype=np.int64))
+    prices = np.ascontiguousarray(prices, dtype=np.float64).ravel()
+    high_prices = prices if high_prices is None else np.ascontiguousarray(high_prices, dtype=np.float64).ravel()
+    low_prices = prices if low_prices is None else np.ascontiguousarray(low_prices, dtype=np.float64).ravel()
+    upper_prices = np.ascontiguousarray(upper_prices, dtype=np.float64).ravel()
+    lower_prices = np.ascontiguousarray(lower_prices, dtype=np.float64).ravel()
+    time_barriers = np.broadcast_to(np.asarray(time_barrier, dtype=np.int64), (m,))
+    labels = np.zeros(n * m, dtype=np.int8)
+
+    # (step, asset) windows complete and with no barrier touched yet, as flat positions in the C-ordered panel
+    steps, assets = np.nonzero(np.arange(n)[:, np.newaxis] < n - time_barriers[np.newaxis, :])
+    active = steps * m + assets
+    limits = time_barriers[assets]
+    upper_prices = upper_prices[active]
+    lower_prices = lower_prices[active]
+
+    if return_events:
+        # windows end at their time barrier unless a barrier is touched before
+        touches = np.full(n * m, -1, dtype=np.int64)
+        touches[active] = steps + limits
+        hits = np.zeros(n * m, dtype=np.int8)
+
+    # a zero time barrier ends the window on its own step: nothing to search (and no future step to index)
+    searched = limits > 0
+    active, limits = active[searched], limits[searched]
+    upper_prices, lower_prices = upper_prices[searched], lower_prices[searched]
+
+    for horizon in range(1, int(time_barriers.max(initial=0)) + 1):
+        if active.size == 0:
+            break
+        future = active + horizon * m
+        upper_touch = high_prices[future] > upper_prices
+        lower_touch = low_prices[future] < lower_prices
+
+        # both barriers at the same horizon: label given by the tie rule
+        # (default 'lower', as the loop based labeling)
+        tie = upper_touch & lower_touch
+        labels[active[lower_touch & ~tie]] = -1
+        labels[active[upper_touch & ~tie]] = 1
+        labels[active[tie]] = TIE_RULES[tie_rule]
+
+        if return_events:
+            touched = upper_touch | lower_touch
+            touches[active[touched]] = active[touched] // m + horizon
+            hits[active[touched]] = np.where(tie, 2, np.where(upper_touch, 1, -1))[touched]
+
+        # untouched windows stay active until their own time barrier
+        untouched = ~(upper_touch | lower_touch) & (limits > horizon)
+        active, limits = active[untouched], limits[untouched]
+        upper_prices, lower_prices = upper_prices[untouched], lower_prices[untouched]
+
+    if return_events:
+        return labels.reshape(shape), touches.reshape(shape), hits.reshape(shape)
+    return labels.reshape(shape)
+
+
+def average_uniqueness(starts: np.ndarray, touches: np.ndarray, n: int) -> np.ndarray:
+    """
+    average uniqueness of overlapping events in O(n)
+
+    event i earns the returns of the steps starts[i]+1 .. touches[i]; the concurrency of a step
+    (number of events earning its return) is built with a difference array and a cumulative sum,
+    the mean of 1 / concurrency over each event with a prefix sum
+    an event ending on its own step (time barrier 0) is counted on that step only
+
+    :param starts: (k,) start step of each event
+    :param touches: (k,) touch step of each event (>= start)
+    :param n: number of steps of the series
+    :return: (k,) average uniqueness of each event, in (0, 1]
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    touches = np.asarray(touches, dtype=np.int64)
+    # first step of each event: starts + 1, or the start itself for zero length events (at least one step)
+    firsts = np.where(touches > starts, starts + 1, starts)
+
+    difference = np.zeros(n + 1, dtype=np.int64)
+    np.add.at(difference, firsts, 1)
+    np.add.at(difference, touches + 1, -1)
+    concurrency = np.cumsum(difference[:n])
+
+    with np.errstate(divide='ignore'):
+        inverse = np.where(concurrency > 0, 1.0 / concurrency, 0.0)
+    prefix = np.concatenate(([0.0], np.cumsum(inverse)))
+    return (prefix[touches + 1] - prefix[firsts]) / (touches - firsts + 1)
+
+
+def label_panel(prices, lower_barrier, upper_barrier, time_barrier, barrier_mode: str = 'fixed',
+                volatility_span: int = 20, high=None, low=None, tie_rule: str = 'lower'):
+    """
+    label every asset of a wide (T x assets) price panel in one vectorized pass
+
+    :param prices: pd.DataFrame (index: time, one column per asset) or (T, m) np.ndarray, NaN for missing prices
+    :param lower_barrier: lower barrier, float or per asset values ((m,) array or pd.Series indexed by asset)
+    :param upper_barrier: upper barrier, float or per asset values
+    :param time_barrier: time limit (in terms of steps), int or per asset values
+    :param barrier_mode: 'fixed' percentage barriers or 'volatility' barriers scaled by an EWM std of returns
+    :param volatility_span: span of the EWM std of returns used in 'volatility' mode
+    :param high: panel of highs (same layout as prices), OHLC mode when given with low
+    :param low: panel of lows (same layout as prices)
+    :param tie_rule: label when both barriers are touched at the same step: 'lower', 'upper' or 'hold'
+    :return: int8 labels, pd.DataFrame with the index and columns of prices or (T, m) np.ndarray
+    """
+    if barrier_mode not in ('fixed', 'volatility'):
+        raise ValueError(f"unknown barrier_mode '{barrier_mode}', expected 'fixed' or 'volatility'")
+
+    columns = prices.columns if isinstance(prices, pd.DataFrame) else None
+    values = np.asarray(prices, dtype=np.float64)
+    if values.ndim != 2:
+        raise ValueError(f"prices must be a 2-D (T, assets) panel, got {values.ndim} dimension(s)")
+
+    def per_asset(barrier, dtype):
+        # pd.Series of per asset values are aligned on the panel columns
+        if isinstance(barrier, pd.Series) and columns is not None:
+            barrier = barrier.reindex(columns)
+        return np.broadcast_to(np.asarray(barrier, dtype=dtype), (values.shape[1],))
+
+    lower_barrier = per_asset(lower_barrier, np.float64)
+    upper_barrier = per_asset(upper_barrier, np.float64)
+    time_barrier = per_asset(time_barrier, np.int64)
+
+    if barrier_mode == 'volatility':
+        # returns next to a missing price are NaN (no forward fill across gaps)
+        volatility = pd.DataFrame(values).pct_change(fill_method=None).ewm(span=volatility_span).std().to_numpy()
+        lower_prices = values * (1 + lower_barrier * volatility)
+        upper_prices = values * (1 + upper_barrier * volatility)
+    else:
+        lower_prices = values * (1 + lower_barrier)
+        upper_prices = values * (1 + upper_barrier)
+
+    if (high is None) != (low is None):
+        raise ValueError("OHLC mode needs both high and low")
+    if high is not None:
+        high, low = np.asarray(high, dtype=np.float64), np.asarray(low, dtype=np.float64)
+        if high.shape != values.shape or low.shape != values.shape:
+            raise ValueError(f"high and low must have the shape of prices {values.shape}")
+
+    labels = first_touch_labels(values, upper_prices, lower_prices, time_barrier, high_prices=high, low_prices=low,
+                                tie_rule=tie_rule)
+    if columns is None:
+        return labels
+    return pd.DataFrame(labels, index=prices.index, columns=columns)
+
 
 @dataclass
 class TripleBarrierMethod:
@@ -20,8 +203,15 @@ class TripleBarrierMethod:
     Attributes:
         target_price (pd.Series): time series of target prices to analyze
         lower_barrier (float): relative percentage change defining the lower barrier
+                               ('volatility' mode: multiplier of the rolling volatility, negative)
         upper_barrier (float): relative percentage change defining the upper barrier
+                               ('volatility' mode: multiplier of the rolling volatility, positive)
         time_barrier (int): Time limit (in terms of steps) to check for barrier crossing
+        barrier_mode (str): 'fixed' percentage barriers or 'volatility' barriers scaled by an EWM std of returns
+        volatility_span (int): span of the EWM std of returns used in 'volatility' mode
+        high_price (pd.Series): optional highs, OHLC mode: upper barrier tested against the highs
+        low_price (pd.Series): optional lows, OHLC mode: lower barrier tested against the lows
+        tie_rule (str): label when both barriers are touched in the same bar: 'lower' (-1), 'upper' (1) or 'hold' (0)
         df_barrier_price (pd.DataFrame): df initialized post-construction, containing the target prices,
                                          calculated upper and lower barrier prices, and the labels
     """
@@ -29,6 +219,11 @@ class TripleBarrierMethod:
     lower_barrier: float
     upper_barrier: float
     time_barrier: int
+    barrier_mode: str = 'fixed'
+    volatility_span: int = 20
+    high_price: pd.Series = None
+    low_price: pd.Series = None
+    tie_rule: str = 'lower'
     df_barrier_price: pd.DataFrame = field(init=False)
 
 
@@ -39,17 +234,36 @@ class TripleBarrierMethod:
         self.df_barrier_price = self._construct_barrier_price_df()
     
 
+    @profiled()
     def _construct_barrier_price_df(self) -> pd.DataFrame:
         """
         construct df with target prices, upper and lower barriers
         """
+        if self.barrier_mode not in ('fixed', 'volatility'):
+            raise ValueError(f"unknown barrier_mode '{self.barrier_mode}', expected 'fixed' or 'volatility'")
+
+        if (self.high_price is None) != (self.low_price is None):
+            raise ValueError("OHLC mode needs both high_price and low_price")
+
         df_barrier_price = pd.DataFrame(index=self.target_price.index)
         df_barrier_price['target_price'] = self.target_price
-        df_barrier_price['lower_barrier_price'] = self.target_price * (1 + self.lower_barrier)
-        df_barrier_price['upper_barrier_price'] = self.target_price * (1 + self.upper_barrier)
+        if self.high_price is not None:
+            df_barrier_price['high_price'] = self.high_price
+            df_barrier_price['low_price'] = self.low_price
+
+        if self.barrier_mode == 'volatility':
+            # barriers scale with the EWM std of returns (NaN during warm-up: no barrier, label 0)
+            volatility = self.target_price.pct_change(fill_method=None).ewm(span=self.volatility_span).std()
+            df_barrier_price['volatility'] = volatility
+            df_barrier_price['lower_barrier_price'] = self.target_price * (1 + self.lower_barrier * volatility)
+            df_barrier_price['upper_barrier_price'] = self.target_price * (1 + self.upper_barrier * volatility)
+        else:
+            df_barrier_price['lower_barrier_price'] = self.target_price * (1 + self.lower_barrier)
+            df_barrier_price['upper_barrier_price'] = self.target_price * (1 + self.upper_barrier)
         return df_barrier_price
     
 
+    @profiled()
     def label_data(self) -> pd.DataFrame:
         """
         label the target series based using the triple barrier method
@@ -58,29 +272,74 @@ class TripleBarrierMethod:
         1 if the price crosses the upper barrier within the time limit
         -1 if the price crosses the lower barrier within the time limit
         0 if neither barrier is crossed within the time limit
+        the last time_barrier steps (incomplete window) are labeled 0
+        in OHLC mode a bar touching both barriers is labeled with the tie_rule
         """
-        labels = np.zeros(len(self.df_barrier_price), dtype=int)
-
-        for idx in range(len(self.df_barrier_price) - self.time_barrier):
-            upper_price = self.df_barrier_price['upper_barrier_price'].iloc[idx]
-            lower_price = self.df_barrier_price['lower_barrier_price'].iloc[idx]
-            
-            # extract price window for one index
-            price_window = self.df_barrier_price['target_price'].iloc[idx + 1: idx + 1 + self.time_barrier]
-            
-            # check if the price crosses the upper or lower barrier first
-            upper_cross_idx = price_window[price_window > upper_price].index
-            lower_cross_idx = price_window[price_window < lower_price].index
-
-            if len(upper_cross_idx) > 0 and len(lower_cross_idx) > 0:
-                labels[idx] = 1 if upper_cross_idx[0] < lower_cross_idx[0] else -1
-            elif len(upper_cross_idx) > 0:
-                labels[idx] = 1
-            elif len(lower_cross_idx) > 0:
-                labels[idx] = -1
+        ohlc = self.high_price is not None
+        labels = first_touch_labels(self.df_barrier_price['target_price'].to_numpy(dtype=np.float64),
+                                    self.df_barrier_price['upper_barrier_price'].to_numpy(dtype=np.float64),
+                                    self.df_barrier_price['lower_barrier_price'].to_numpy(dtype=np.float64),
+                                    self.time_barrier,
+                                    high_prices=self.df_barrier_price['high_price'].to_numpy(dtype=np.float64) if ohlc else None,
+                                    low_prices=self.df_barrier_price['low_price'].to_numpy(dtype=np.float64) if ohlc else None,
+                                    tie_rule=self.tie_rule)
 
         self.df_barrier_price['label'] = labels.astype(int)
         return self.df_barrier_price
+
+
+    def label_events(self) -> pd.DataFrame:
+        """
+        label the target series (as label_data) and build, in the same pass, the event table
+        of the complete windows with their average uniqueness
+
+        Columns:
+        start / touch: positions of the window start and of the first touch (time barrier if none)
+        touch_date: date of the first touch
+        barrier: barrier hit first ('upper', 'lower', 'vertical' or 'both' in the same bar)
+        label: label of the window
+        ret: realized return between start and touch
+        holding: number of steps between start and touch
+        uniqueness: average uniqueness of the window, usable as training sample weight
+        """
+        ohlc = self.high_price is not None
+        prices = self.df_barrier_price['target_price'].to_numpy(dtype=np.float64)
+        labels, touches, hits = first_touch_labels(
+            prices,
+            self.df_barrier_price['upper_barrier_price'].to_numpy(dtype=np.float64),
+            self.df_barrier_price['lower_barrier_price'].to_numpy(dtype=np.float64),
+            self.time_barrier,
+            high_prices=self.df_barrier_price['high_price'].to_numpy(dtype=np.float64) if ohlc else None,
+            low_prices=self.df_barrier_price['low_price'].to_numpy(dtype=np.float64) if ohlc else None,
+            tie_rule=self.tie_rule, return_events=True)
+        self.df_barrier_price['label'] = labels.astype(int)
+
+        starts = np.flatnonzero(touches >= 0)
+        touches = touches[starts]
+        events = pd.DataFrame({
+            'start': starts,
+            'touch': touches,
+            'touch_date': self.df_barrier_price.index[touches],
+            'barrier': pd.Categorical.from_codes(hits[starts] + 1,
+                                                 categories=[BARRIER_HITS[code] for code in (-1, 0, 1, 2)]),
+            'label': labels[starts],
+            'ret': (prices[touches] / prices[starts] - 1).astype(np.float32),
+            'holding': touches - starts,
+            'uniqueness': average_uniqueness(starts, touches, len(prices)),
+        }, index=self.df_barrier_price.index[starts])
+        return events
+
+
+    def sample_weights(self, events: pd.DataFrame = None) -> pd.Series:
+        """
+        average uniqueness weight of every step (0 for the incomplete windows at the end of the series)
+
+        :param events: event table from label_events (computed if None)
+        """
+        events = self.label_events() if events is None else events
+        weights = np.zeros(len(self.df_barrier_price))
+        weights[events['start'].to_numpy()] = events['uniqueness'].to_numpy()
+        return pd.Series(weights, index=self.df_barrier_price.index, name='weight')
     
 
     def plot_labels(self, colors: list, title: str):
@@ -163,4 +422,9 @@ if __name__ == '__main__':
     df_labeled = tbm.label_data()
     tbm.plot_labels(colors=['#ff0000', '#7945d9', '#0fff00'], title='Labeled Price Data')
     tbm.plot_square(date='2023-02-08 00:00:00', title='Triple-Barrier square exemple')
+
+    # panel of 3 assets with per asset time barriers (a zero barrier next to positive ones)
+    panel = data_daily['Close'].to_numpy().reshape(-1, 1) * np.array([1.0, 1.0, 1.0])
+    panel_labels = label_panel(panel, lower_barrier=-0.10, upper_barrier=0.10, time_barrier=np.array([0, 5, 40]))
+    print(pd.DataFrame(panel_labels, columns=['tb_0', 'tb_5', 'tb_40']).apply(pd.Series.value_counts))
     
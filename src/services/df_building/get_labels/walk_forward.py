@@ -0,0 +1,169 @@
+"""
+@author: Louis Lebreton
+Walk-forward re-optimization of the TBM parameters on rolling or expanding windows
+"""
+import random
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from deap import tools
+from services.df_building.get_labels.triple_barrier_method import TripleBarrierMethod
+from services.df_building.get_labels.equity_strategy import EquityStrategy
+from services.df_building.get_labels.GA_optimization import build_toolbox, evolve_generation, is_feasible
+
+
+def walk_forward_windows(n: int, window_size: int, step: int, expanding: bool = False) -> list:
+    """
+    positions [start, end) of the optimization windows
+
+    :param n: length of the series
+    :param window_size: length of the first (expanding) or of every (rolling) window
+    :param step: shift between two consecutive windows
+    :param expanding: if True every window starts at 0
+    :return: list of (start, end) tuples
+    """
+    return [(0 if expanding else end - window_size, end) for end in range(window_size, n + 1, step)]
+
+
+@dataclass
+class WindowLabeler:
+    """
+    labels the full series once per barrier triple and slices it for every window
+
+    the label at position i only depends on the prices i+1 .. i+time_barrier, so the labels of a window
+    [start, end) are the full series labels with the last time_barrier positions set to 0 (hold),
+    exactly what labeling the window alone would give
+
+    Attributes:
+        target_price: time series of target prices to analyze
+        cache_size: number of barrier triples kept in memory
+    """
+    target_price: pd.Series
+    cache_size: int = 4096
+    n_hits: int = 0
+    n_misses: int = 0
+    _cache: OrderedDict = field(default_factory=OrderedDict, repr=False)
+
+    def full_labels(self, lower_barrier: float, upper_barrier: float, time_barrier: int) -> np.ndarray:
+        key = (lower_barrier, upper_barrier, time_barrier)
+        if key in self._cache:
+            self.n_hits += 1
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        self.n_misses += 1
+        tbm = TripleBarrierMethod(self.target_price, lower_barrier=lower_barrier, upper_barrier=upper_barrier,
+                                  time_barrier=time_barrier)
+        labels = tbm.label_data()['label'].to_numpy(dtype=np.int8)
+        self._cache[key] = labels
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return labels
+
+    def window_frame(self, lower_barrier: float, upper_barrier: float, time_barrier: int,
+                     start: int, end: int) -> pd.DataFrame:
+        """
+        df with the target prices and labels of one window (input of EquityStrategy)
+        """
+        labels = self.full_labels(lower_barrier, upper_barrier, time_barrier)[start:end].copy()
+        labels[max(end - start - time_barrier, 0):] = 0
+        return pd.DataFrame({'target_price': self.target_price.iloc[start:end], 'label': labels})
+
+
+def evaluate_individual_window(individual, weight_p: float, weight_mdd: float, labeler: WindowLabeler,
+                               start: int, end: int) -> tuple:
+    """
+    evaluate one individual on one window [start, end) reusing the cached full series labels
+
+    :return: fitness value (deap need a tuple as fitness value)
+    """
+    lower_barrier, upper_barrier, time_barrier, buy_number, sell_number = individual
+    if not is_feasible(individual):
+        return (0.0,)
+
+    df_labeled = labeler.window_frame(lower_barrier, upper_barrier, int(time_barrier), start, end)
+    equity_strategy = EquityStrategy(df=df_labeled, buy_number=buy_number, sell_number=sell_number)
+    return (equity_strategy.fitness_function(weight_p=weight_p, weight_mdd=weight_mdd),)
+
+
+def _run_chain(target_price, windows, weight_p, weight_mdd, population_size, nb_gen, crossover, mutation,
+               seed) -> list:
+    """
+    optimize consecutive windows in one process, each window warm-starting from the previous population
+    """
+    random.seed(seed)
+    np.random.seed(seed)
+    labeler = WindowLabeler(target_price)
+    toolbox = build_toolbox(target_price, weight_p=weight_p, weight_mdd=weight_mdd)
+    population = toolbox.population(n=population_size)
+    rows = []
+
+    for start, end in windows:
+        toolbox.register("evaluate", partial(evaluate_individual_window, weight_p=weight_p, weight_mdd=weight_mdd,
+                                             labeler=labeler, start=start, end=end))
+        # fitness values of the previous window are meaningless on the new one
+        for ind in population:
+            del ind.fitness.values
+
+        for _ in range(nb_gen):
+            population = evolve_generation(population, toolbox, population_size, crossover, mutation)
+
+        best_individual = tools.selBest(population, k=1)[0]
+        rows.append({'date': target_price.index[end - 1], 'start': target_price.index[start],
+                     'lower_barrier': best_individual[0], 'upper_barrier': best_individual[1],
+                     'time_barrier': int(best_individual[2]), 'buy_number': best_individual[3],
+                     'sell_number': best_individual[4], 'fitness': best_individual.fitness.values[0]})
+        print(f"window {target_price.index[start]} -> {target_price.index[end - 1]}: "
+              f"best fitness {np.round(best_individual.fitness.values[0], 2)} "
+              f"(labels cache: {labeler.n_hits} hits / {labeler.n_misses} misses)")
+    return rows
+
+
+def run_walk_forward(target_price: pd.Series, window_size: int, step: int, weight_p: float, weight_mdd: float,
+                     population_size: int = 50, nb_gen: int = 5, crossover: float = 0.7, mutation: float = 0.2,
+                     expanding: bool = False, n_workers: int = 1, seed: int = 999) -> pd.DataFrame:
+    """
+    walk-forward optimization of the TBM parameters
+
+    the windows are split in n_workers chains of consecutive windows optimized in parallel;
+    inside a chain every window warm-starts from the previous window's final population
+
+    :param target_price: time series of target prices to analyze
+    :param window_size: window length (first window length if expanding)
+    :param step: shift between two consecutive windows
+    :param weight_p: weight of profit
+    :param weight_mdd: weight of maximum drawdown
+    :param population_size: population_size
+    :param nb_gen: nb of generations per window
+    :param crossover: crossover probability.
+    :param mutation: mutation probability.
+    :param expanding: expanding windows instead of rolling windows
+    :param n_workers: number of parallel chains (processes)
+    :param seed: base seed, chain i uses seed + i
+    :return: parameter table indexed by the last date of each window
+    """
+    windows = walk_forward_windows(len(target_price), window_size, step, expanding)
+    if not windows:
+        raise ValueError(f"no walk-forward window: the series has {len(target_price)} steps, "
+                         f"fewer than window_size={window_size}")
+    chains = [chain.tolist() for chain in np.array_split(np.array(windows), min(n_workers, len(windows)))]
+
+    with ProcessPoolExecutor(max_workers=len(chains)) as executor:
+        futures = [executor.submit(_run_chain, target_price, chain, weight_p, weight_mdd, population_size, nb_gen,
+                                   crossover, mutation, seed + i)
+                   for i, chain in enumerate(chains)]
+        rows = [row for future in futures for row in future.result()]
+
+    return pd.DataFrame(rows).set_index('date')
+
+
+if __name__ == '__main__':
+
+    # walk-forward on the bitcoin history: 1 year windows re-optimized every quarter
+    df_btc = pd.read_csv('data/data_HRHP.csv', index_col=0, parse_dates=True)
+    tbm_parameters = run_walk_forward(df_btc['price'], window_size=365, step=90, weight_p=0.7, weight_mdd=0.3,
+                                      population_size=50, nb_gen=5, n_workers=4)
+    print(tbm_parameters)
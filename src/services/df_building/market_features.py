@@ -0,0 +1,84 @@
+"""
+@author: Louis Lebreton
+Construction des variables Bitcoin et traitement des données macroéconomiques
+(mêmes transformations que dans df_builder.ipynb)
+"""
+import pandas as pd
+
+
+def load_btc_csv(path: str) -> pd.DataFrame:
+    """
+    chargement des données BTC historiques issues de Coincodex (ordre chronologique)
+
+    Args :
+    - path (str): chemin du csv (colonnes Start, End, Open, High, Low, Close, Volume, Market Cap)
+
+    Return:
+    - df_btc (pd.DataFrame)
+    """
+    df_btc = pd.read_csv(path, encoding='utf-8-sig')
+    df_btc = df_btc.iloc[::-1].reset_index(drop=True)
+    df_btc = df_btc.drop(columns=['End'])
+    df_btc = df_btc.rename(columns={'Close': 'price',
+                                    'Start': 'date',
+                                    'Volume': 'volume',
+                                    'Market Cap': 'market_cap'})
+    return df_btc
+
+
+def btc_features(df_btc: pd.DataFrame) -> pd.DataFrame:
+    """
+    variables Bitcoin : pourcentages d'augmentation, moyennes mobiles 7 et 30 jours, lags 7 et 30 jours
+    la date est passée en index
+
+    Args :
+    - df_btc (pd.DataFrame): colonnes date, price, volume, market_cap
+
+    Return:
+    - df_btc (pd.DataFrame)
+    """
+    df_btc = df_btc.copy()
+    columns = ['volume', 'market_cap', 'price']
+
+    # pct_change
+    for col in columns:
+        df_btc[f'increase_{col}'] = (df_btc[col] - df_btc[col].shift(1)) / df_btc[col].shift(1)
+
+    # moving average 7 jours et 1 mois
+    for window in (7, 30):
+        for col in columns:
+            df_btc[f'MA{window}_{col}'] = df_btc[col].rolling(window=window).mean()
+
+    # lags 1 semaine et 1 mois
+    for lag in (7, 30):
+        for col in columns:
+            df_btc[f'{col}_lag_{lag}'] = df_btc[col].shift(lag)
+
+    # date en index
+    df_btc.index = pd.to_datetime(df_btc['date'])
+    df_btc = df_btc.drop(columns=['date'])
+    return df_btc
+
+
+def clean_economic_data(df_economic: pd.DataFrame) -> pd.DataFrame:
+    """
+    traitement des valeurs manquantes des variables macroéconomiques FRED
+
+    Args :
+    - df_economic (pd.DataFrame): colonne date et une colonne par série FRED
+
+    Return:
+    - df_economic (pd.DataFrame): date en index
+    """
+    df_economic = df_economic.copy()
+    df_economic.index = pd.to_datetime(df_economic['date'])
+    df_economic = df_economic.drop(columns=['date'])
+
+    df_economic['CPIAUCSL'] = df_economic['CPIAUCSL'].ffill() # seulement une valeur par mois
+    df_economic['FINCP'] = df_economic['FINCP'].bfill()       # seulement une valeur par semaine
+    df_economic['NFINCP'] = df_economic['NFINCP'].bfill()     # seulement une valeur par semaine
+
+    # autres valeurs manquantes par interpolation linéaire
+    for col in df_economic.columns:
+        df_economic[col] = df_economic[col].interpolate().bfill().ffill()
+    return df_economic
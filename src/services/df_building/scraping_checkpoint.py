@@ -0,0 +1,83 @@
+"""
+@author: Louis Lebreton
+Checkpoints du scraping de tweets
+Un fichier json par compte et par intervalle demandé dans data/tweets/checkpoints/
+Le scraping remonte le temps depuis until_date : le curseur est la borne haute de la prochaine fenêtre
+"""
+import json
+import os
+from dataclasses import dataclass, field, asdict
+
+
+@dataclass
+class ScrapingCheckpoint:
+    """
+    état durable du scraping d'un compte X entre 2 dates
+
+    Attributes:
+        account (str): compte X
+        since_date (str): date la plus ancienne à scraper (AAAA-MM-JJ)
+        until_date (str): date la plus récente à scraper (AAAA-MM-JJ)
+        cursor (str): borne haute de la prochaine fenêtre à scraper
+        last_tweet_timestamp (str): timestamp du dernier tweet enregistré
+        completed_windows (list): fenêtres terminées [since, until]
+        done (bool): intervalle entièrement scrapé
+        path (str): chemin du fichier json
+    """
+    account: str
+    since_date: str
+    until_date: str
+    cursor: str = None
+    last_tweet_timestamp: str = None
+    completed_windows: list = field(default_factory=list)
+    done: bool = False
+    path: str = None
+
+    def __post_init__(self):
+        if self.cursor is None:
+            self.cursor = self.until_date
+
+    def save(self) -> None:
+        """
+        écriture atomique du checkpoint (fichier temporaire puis renommage)
+        """
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        state = asdict(self)
+        state.pop('path')
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w') as json_file:
+            json.dump(state, json_file, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def complete_window(self, window_since: str, window_until: str, next_cursor: str,
+                        last_tweet_timestamp: str = None) -> None:
+        """
+        enregistre une fenêtre terminée et avance le curseur
+        """
+        self.completed_windows.append([window_since, window_until])
+        if last_tweet_timestamp is not None:
+            self.last_tweet_timestamp = last_tweet_timestamp
+        self.cursor = next_cursor
+        self.done = next_cursor <= self.since_date
+        self.save()
+
+
+def load_checkpoint(account: str, since_date: str, until_date: str,
+                    checkpoint_dir: str = 'data/tweets/checkpoints') -> ScrapingCheckpoint:
+    """
+    chargement du checkpoint d'un compte pour un intervalle (ou création d'un checkpoint vierge)
+
+    Args :
+    - account (str): compte X
+    - since_date (str): date la plus ancienne (AAAA-MM-JJ)
+    - until_date (str): date la plus récente (AAAA-MM-JJ)
+    - checkpoint_dir (str): dossier des checkpoints
+
+    Return:
+    - (ScrapingCheckpoint)
+    """
+    path = os.path.join(checkpoint_dir, f'{account}_{since_date}_{until_date}.json')
+    if os.path.exists(path):
+        with open(path) as json_file:
+            return ScrapingCheckpoint(**json.load(json_file), path=path)
+    return ScrapingCheckpoint(account=account, since_date=since_date, until_date=until_date, path=path)
@@ -0,0 +1,117 @@
+"""
+@author: Louis Lebreton
+Agrégation journalière des scores de sentiment et construction des variables dérivées
+- statistiques suffisantes (count, somme, somme des carrés) par jour et par auteur en une passe
+- moyenne, nombre de tweets et écart-type par jour et par jour x auteur
+- variables increase / MA7 / MA30 recalculables uniquement sur les nouveaux jours
+"""
+import numpy as np
+import pandas as pd
+
+SENTIMENT_COLUMNS = ['negative', 'neutral', 'positive']
+
+
+def sentiment_stats(df_tweets: pd.DataFrame, columns: list = SENTIMENT_COLUMNS) -> pd.DataFrame:
+    """
+    statistiques suffisantes des scores par (date, author) en un seul groupby vectorisé
+    elles sont additives : des statistiques de nouveaux tweets s'ajoutent aux anciennes
+
+    Args :
+    - df_tweets (pd.DataFrame): tweets scorés avec les colonnes timestamp, author et les scores
+    - columns (list): colonnes de scores
+
+    Return:
+    - stats (pd.DataFrame): index (date, author), colonnes count, {col}_sum, {col}_sumsq
+    """
+    timestamps = pd.to_datetime(df_tweets['timestamp'])
+    if timestamps.dt.tz is not None:
+        timestamps = timestamps.dt.tz_localize(None)
+
+    scores = df_tweets[columns].to_numpy(dtype=np.float64)
+    values = pd.DataFrame(
+        np.hstack([np.ones((len(scores), 1)), scores, scores ** 2]),
+        columns=['count'] + [f'{col}_sum' for col in columns] + [f'{col}_sumsq' for col in columns],
+        index=pd.MultiIndex.from_arrays([timestamps.dt.normalize(), df_tweets['author'].to_numpy()],
+                                        names=['date', 'author'])
+    )
+    return values.groupby(level=['date', 'author']).sum()
+
+
+def merge_sentiment_stats(stats: pd.DataFrame, new_stats: pd.DataFrame) -> pd.DataFrame:
+    """
+    fusion de statistiques existantes avec celles de nouveaux tweets (sans relire l'historique)
+    """
+    if stats is None or stats.empty:
+        return new_stats
+    return stats.add(new_stats, fill_value=0).sort_index()
+
+
+def _moments(stats: pd.DataFrame, columns: list) -> pd.DataFrame:
+    """
+    moyenne, écart-type (ddof=1) et nombre de tweets à partir des statistiques suffisantes
+    """
+    count = stats['count'].to_numpy()
+    moments = pd.DataFrame(index=stats.index)
+    for col in columns:
+        mean = stats[f'{col}_sum'].to_numpy() / count
+        with np.errstate(invalid='ignore', divide='ignore'):
+            var = (stats[f'{col}_sumsq'].to_numpy() - count * mean ** 2) / (count - 1)
+        moments[col] = mean
+        moments[f'{col}_std'] = np.sqrt(np.clip(var, 0, None))
+    moments['n_tweets'] = count.astype(np.int64)
+    return moments
+
+
+def daily_sentiment(stats: pd.DataFrame, columns: list = SENTIMENT_COLUMNS) -> tuple:
+    """
+    agrégation par jour et par jour x auteur
+
+    Args :
+    - stats (pd.DataFrame): statistiques suffisantes issues de sentiment_stats
+    - columns (list): colonnes de scores
+
+    Return (tuple):
+    - df_daily (pd.DataFrame): index date, moyenne / écart-type / nombre de tweets du jour
+    - df_author (pd.DataFrame): index (date, author), mêmes colonnes par auteur
+    """
+    df_daily = _moments(stats.groupby(level='date').sum(), columns)
+    df_author = _moments(stats, columns)
+    return df_daily, df_author
+
+
+def sentiment_features(df_daily: pd.DataFrame, columns: list = SENTIMENT_COLUMNS,
+                       ma_windows: tuple = (7, 30), start=None) -> pd.DataFrame:
+    """
+    variables dérivées des scores journaliers (mêmes noms que dans data_HRHP.csv)
+    - increase_{col} : pourcentage d'augmentation en 1 journée
+    - MA{window}_{col} : moyenne mobile
+
+    Args :
+    - df_daily (pd.DataFrame): scores moyens journaliers (index date)
+    - columns (list): colonnes de scores
+    - ma_windows (tuple): fenêtres des moyennes mobiles
+    - start : si renseigné, seules les lignes à partir de cette date sont recalculées et renvoyées
+              (en ne relisant que max(ma_windows) jours d'historique)
+
+    Return:
+    - df_features (pd.DataFrame): scores moyens et variables dérivées
+    """
+    df_daily = df_daily[columns].sort_index()
+    if start is not None:
+        first_new = df_daily.index.searchsorted(pd.Timestamp(start))
+        df_daily = df_daily.iloc[max(first_new - max(ma_windows), 0):]
+
+    values = df_daily.to_numpy(dtype=np.float64)
+    previous = df_daily.shift(1).to_numpy(dtype=np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        increase = (values - previous) / previous
+
+    blocks = [df_daily,
+              pd.DataFrame(increase, index=df_daily.index, columns=[f'increase_{col}' for col in columns])]
+    for window in ma_windows:
+        blocks.append(df_daily.rolling(window=window).mean().add_prefix(f'MA{window}_'))
+    df_features = pd.concat(blocks, axis=1)
+
+    if start is not None:
+        df_features = df_features[df_features.index >= pd.Timestamp(start)]
+    return df_features
@@ -0,0 +1,172 @@
+"""
+@author: Louis Lebreton
+Stockage consolidé des tweets scrapés
+Un unique store Parquet append-only, partitionné par compte et par mois :
+data/tweets/store/account={compte}/month={AAAA-MM}/data.parquet
+"""
+import os
+from dataclasses import dataclass
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+# clef de déduplication d'un tweet
+DEDUP_COLUMNS = ['timestamp', 'tweet_text']
+
+
+@dataclass
+class TweetStore:
+    """
+    store Parquet des tweets partitionné par compte et par mois
+    chaque partition est dédupliquée à l'écriture, le store n'est jamais réécrit en entier
+
+    Attributes:
+        root (str): dossier racine du store
+    """
+    root: str = 'data/tweets/store'
+
+    def _account_dir(self, account: str) -> str:
+        return os.path.join(self.root, f'account={account}')
+
+    def _partition_path(self, account: str, month: str) -> str:
+        return os.path.join(self._account_dir(account), f'month={month}', 'data.parquet')
+
+    def _months(self, account: str) -> list:
+        """
+        mois déjà présents dans le store pour un compte (triés)
+        """
+        account_dir = self._account_dir(account)
+        if not os.path.isdir(account_dir):
+            return []
+        return sorted(d.split('=', 1)[1] for d in os.listdir(account_dir) if d.startswith('month='))
+
+    def accounts(self) -> list:
+        """
+        comptes présents dans le store
+        """
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(d.split('=', 1)[1] for d in os.listdir(self.root) if d.startswith('account='))
+
+    def append(self, account: str, tweets_df: pd.DataFrame) -> int:
+        """
+        ajout de tweets d'un compte au store
+        seules les partitions (mois) touchées sont relues, fusionnées et dédupliquées
+
+        Args :
+        - account (str): compte X
+        - tweets_df (pd.DataFrame): tweets avec les colonnes timestamp, tweet_text (et author)
+
+        Return:
+        - (int) nombre de nouveaux tweets écrits
+        """
+        if tweets_df is None or tweets_df.empty:
+            return 0
+
+        tweets_df = tweets_df.copy()
+        tweets_df['timestamp'] = pd.to_datetime(tweets_df['timestamp'], utc=True)
+        tweets_df = tweets_df.dropna(subset=['timestamp'])
+        months = tweets_df['timestamp'].dt.strftime('%Y-%m')
+
+        n_new = 0
+        for month, df_month in tweets_df.groupby(months):
+            path = self._partition_path(account, month)
+            df_month = df_month.drop_duplicates(DEDUP_COLUMNS, keep='last')
+
+            if os.path.exists(path):
+                df_existing = pd.read_parquet(path)
+                n_before = len(df_existing)
+                df_month = pd.concat([df_existing, df_month], ignore_index=True)
+                df_month = df_month.drop_duplicates(DEDUP_COLUMNS, keep='first')
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                n_before = 0
+
+            if len(df_month) == n_before:
+                continue
+
+            # écriture atomique : un crash ne laisse jamais une partition à moitié écrite
+            df_month = df_month.sort_values('timestamp').reset_index(drop=True)
+            # fichier caché : ignoré par la lecture du dataset tant qu'il n'est pas renommé
+            tmp_path = os.path.join(os.path.dirname(path), '.data.parquet.tmp')
+            df_month.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, path)
+            n_new += len(df_month) - n_before
+
+        return n_new
+
+    def latest_timestamp(self, account: str):
+        """
+        timestamp du tweet le plus récent d'un compte
+        seule la colonne timestamp de la dernière partition est lue
+
+        Return:
+        - (pd.Timestamp | None)
+        """
+        months = self._months(account)
+        if not months:
+            return None
+        table = pq.read_table(self._partition_path(account, months[-1]), columns=['timestamp'])
+        return pd.Timestamp(table.column('timestamp').to_pandas().max())
+
+    def latest_timestamps(self) -> dict:
+        """
+        timestamp du tweet le plus récent pour chaque compte du store
+        """
+        return {account: self.latest_timestamp(account) for account in self.accounts()}
+
+    def load(self, accounts: list = None, start_date: str = None, end_date: str = None) -> pd.DataFrame:
+        """
+        chargement de tous les tweets en une seule lecture vectorisée du dataset partitionné
+        la colonne author contient le nom court du compte (comme dans data_tweets.csv)
+
+        Args :
+        - accounts (list): comptes à charger (tous par défaut)
+        - start_date (str): date de début incluse (AAAA-MM-JJ)
+        - end_date (str): date de fin incluse (AAAA-MM-JJ)
+
+        Return:
+        - df (pd.DataFrame): colonnes author, timestamp, tweet_text
+        """
+        columns = ['author', 'timestamp', 'tweet_text']
+        if not self.accounts():
+            return pd.DataFrame(columns=columns)
+
+        filters = []
+        if accounts:
+            filters.append(('account', 'in', list(accounts)))
+        # filtre grossier sur les partitions puis filtre exact sur les timestamps
+        if start_date:
+            filters.append(('month', '>=', start_date[:7]))
+        if end_date:
+            filters.append(('month', '<=', end_date[:7]))
+
+        df = pd.read_parquet(self.root, columns=['account', 'timestamp', 'tweet_text'],
+                             filters=filters or None, partitioning='hive')
+        if start_date:
+            df = df[df['timestamp'] >= pd.Timestamp(start_date, tz='UTC')]
+        if end_date:
+            df = df[df['timestamp'] < pd.Timestamp(end_date, tz='UTC') + pd.Timedelta(days=1)]
+
+        df = df.rename(columns={'account': 'author'})
+        df['author'] = df['author'].astype(str)
+        return df[columns].reset_index(drop=True)
+
+    def import_csv_dumps(self, tweets_dir: str = 'data/tweets') -> int:
+        """
+        migration des anciens exports csv par fenêtre (data/tweets/{compte}/*.csv) vers le store
+
+        Return:
+        - (int) nombre de tweets importés
+        """
+        n_imported = 0
+        for account in sorted(os.listdir(tweets_dir)):
+            account_dir = os.path.join(tweets_dir, account)
+            if not os.path.isdir(account_dir) or os.path.abspath(account_dir) == os.path.abspath(self.root):
+                continue
+            csv_list = [pd.read_csv(os.path.join(account_dir, f))
+                        for f in sorted(os.listdir(account_dir))
+                        if f.endswith('.csv') and os.path.getsize(os.path.join(account_dir, f)) > 2]
+            if csv_list:
+                n_imported += self.append(account, pd.concat(csv_list, ignore_index=True).dropna())
+        return n_imported
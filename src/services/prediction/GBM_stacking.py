@@ -1,7 +1,14 @@
 """
 @author: Louis Lebreton
 GBMs stacking
+sauvegarde native (save / load) : chaque GBM dans son format binaire, le metaclassifier en tableaux numpy
+et un manifest (features, classes, versions, hash sha256 des fichiers)
 """
+import hashlib
+import json
+import os
+from datetime import datetime
+
 import numpy as np
 import pandas as pd
 from sklearn.linear_model import LogisticRegression
@@ -11,6 +18,35 @@ from catboost import CatBoostClassifier
 from lightgbm import LGBMClassifier
 from xgboost import XGBClassifier
 
+# fichiers natifs des GBMs dans le dossier d'un artefact
+MODEL_FILES = {'catboost': 'catboost.cbm', 'lightgbm': 'lightgbm.txt', 'xgboost': 'xgboost.ubj'}
+META_FILE = 'meta_classifier.npz'
+MANIFEST_FILE = 'manifest.json'
+ARTIFACT_VERSION = 1
+
+
+def _sha256(path: str) -> str:
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+class _LightGBMBooster:
+    """
+    booster lightgbm chargé depuis son fichier texte, avec l'interface predict_proba du wrapper sklearn
+    (booster_ comme LGBMClassifier : un modèle chargé peut être sauvegardé à nouveau)
+    """
+    def __init__(self, model_file: str):
+        import lightgbm as lgb
+        self.booster_ = lgb.Booster(model_file=model_file)
+
+    def predict_proba(self, X):
+        probas = np.asarray(self.booster_.predict(X))
+        # objectif binaire : probabilité de la classe 1 seulement
+        return np.column_stack([1 - probas, probas]) if probas.ndim == 1 else probas
+
 
 class GBMStacking(BaseEstimator, ClassifierMixin):
     """
@@ -38,10 +74,26 @@ class GBMStacking(BaseEstimator, ClassifierMixin):
         self.models = {}
         self.meta_classifier = LogisticRegression(**self.logistic_regression_parameters)
         self.classes_ = None
+        self.feature_names_in_ = None
+
+    def __setstate__(self, state):
+        # modèles picklés avant l'ajout de feature_names_in_ : pas de vérification des colonnes
+        state.setdefault('feature_names_in_', None)
+        self.__dict__.update(state)
 
-    def fit(self, X, y):
+    def fit(self, X, y, sample_weight=None):
+        """
+        entrainement des GBMs puis du metaclassifier
+
+        Args :
+        - X : features
+        - y : labels
+        - sample_weight : poids des observations (ex : unicité moyenne des événements TBM),
+                          transmis à chaque GBM et au metaclassifier
+        """
         # X, y = check_X_y(X, y,  force_all_finite=False)
         self.classes_ = np.unique(y)
+        self.feature_names_in_ = list(X.columns) if isinstance(X, pd.DataFrame) else None
         # modeles
         model_classes = {
             'catboost': CatBoostClassifier,
@@ -58,23 +110,25 @@ class GBMStacking(BaseEstimator, ClassifierMixin):
         # entrainement des GBMs
         for model_name in self.models_to_use:
             model = model_classes[model_name](**params[model_name], random_state=self.random_state)
-            model.fit(X, y)
+            model.fit(X, y, sample_weight=sample_weight)
             self.models[model_name] = model
 
         # récupération des probas comme features du metaclassifier
         meta_features = self._generate_meta_features(X)
 
         # fit du metaclassifier
-        self.meta_classifier.fit(meta_features, y)
+        self.meta_classifier.fit(meta_features, y, sample_weight=sample_weight)
         return self
 
     def predict(self, X):
         # X = check_array(X,  force_all_finite=False)
+        X = self._check_features(X)
         meta_features = self._generate_meta_features(X)
         return self.meta_classifier.predict(meta_features)
 
     def predict_proba(self, X):
         # X = check_array(X,  force_all_finite=False)
+        X = self._check_features(X)
         meta_features = self._generate_meta_features(X)
         return self.meta_classifier.predict_proba(meta_features)
 
@@ -82,11 +136,119 @@ class GBMStacking(BaseEstimator, ClassifierMixin):
         meta_features = [model.predict_proba(X) for model in self.models.values()]
         return np.hstack(meta_features)
 
+    def _check_features(self, X):
+        """
+        vérifie les colonnes de X par rapport aux features d'entraînement avant la prédiction
+        (colonnes dans un autre ordre : réordonnées, colonnes manquantes ou en trop : erreur)
+        """
+        if self.feature_names_in_ is None or not isinstance(X, pd.DataFrame):
+            return X
+        columns = list(X.columns)
+        if columns == self.feature_names_in_:
+            return X
+        missing = [col for col in self.feature_names_in_ if col not in X.columns]
+        unexpected = [col for col in columns if col not in self.feature_names_in_]
+        if missing or unexpected:
+            raise ValueError(f"features incompatibles avec le modèle : manquantes {missing}, inattendues {unexpected}")
+        return X[self.feature_names_in_]
+
+    def save(self, directory: str) -> dict:
+        """
+        sauvegarde native : GBMs dans leur format binaire, coefficients du metaclassifier en npz, manifest json
+
+        Args :
+        - directory (str): dossier de l'artefact (créé si besoin)
+
+        Return:
+        - manifest (dict)
+        """
+        import catboost
+        import lightgbm
+        import sklearn
+        import xgboost
+
+        os.makedirs(directory, exist_ok=True)
+        for model_name, model in self.models.items():
+            path = os.path.join(directory, MODEL_FILES[model_name])
+            if model_name == 'lightgbm':
+                model.booster_.save_model(path)
+            else:
+                model.save_model(path)
+
+        np.savez(os.path.join(directory, META_FILE), coef=self.meta_classifier.coef_,
+                 intercept=self.meta_classifier.intercept_, classes=self.meta_classifier.classes_)
+
+        files = [MODEL_FILES[model_name] for model_name in self.models] + [META_FILE]
+        hashes = {name: _sha256(os.path.join(directory, name)) for name in files}
+        manifest = {
+            'artifact_version': ARTIFACT_VERSION,
+            'version_hash': hashlib.sha256(''.join(hashes[name] for name in files).encode()).hexdigest(),
+            'created': datetime.utcnow().isoformat(),
+            'models_to_use': list(self.models),
+            'feature_names': self.feature_names_in_,
+            'classes': self.classes_.tolist(),
+            'logistic_regression_parameters': self.logistic_regression_parameters,
+            'random_state': self.random_state,
+            'libraries': {'catboost': catboost.__version__, 'lightgbm': lightgbm.__version__,
+                          'xgboost': xgboost.__version__, 'scikit-learn': sklearn.__version__},
+            'sha256': hashes,
+        }
+        with open(os.path.join(directory, MANIFEST_FILE), 'w') as json_file:
+            json.dump(manifest, json_file, indent=1)
+        return manifest
+
+    @classmethod
+    def load(cls, directory: str, verify: bool = True) -> 'GBMStacking':
+        """
+        charge un artefact sauvegardé par save (sans pickle)
+
+        Args :
+        - directory (str): dossier de l'artefact
+        - verify (bool): contrôle des hash sha256 des fichiers avant le chargement
+
+        Return:
+        - modèle GBMStacking prêt pour predict / predict_proba
+        """
+        with open(os.path.join(directory, MANIFEST_FILE)) as json_file:
+            manifest = json.load(json_file)
+        if manifest['artifact_version'] != ARTIFACT_VERSION:
+            raise ValueError(f"version d'artefact {manifest['artifact_version']} non supportée (attendue : {ARTIFACT_VERSION})")
+        if verify:
+            for name, expected in manifest['sha256'].items():
+                if _sha256(os.path.join(directory, name)) != expected:
+                    raise ValueError(f"fichier '{name}' de l'artefact {directory} corrompu (hash sha256 différent)")
+
+        model = cls(models_to_use=tuple(manifest['models_to_use']),
+                    logistic_regression_parameters=manifest['logistic_regression_parameters'],
+                    random_state=manifest['random_state'])
+        for model_name in model.models_to_use:
+            path = os.path.join(directory, MODEL_FILES[model_name])
+            if model_name == 'catboost':
+                model.models[model_name] = CatBoostClassifier().load_model(path)
+            elif model_name == 'lightgbm':
+                model.models[model_name] = _LightGBMBooster(path)
+            else:
+                xgb_model = XGBClassifier()
+                xgb_model.load_model(path)
+                model.models[model_name] = xgb_model
+
+        meta = np.load(os.path.join(directory, META_FILE))
+        model.meta_classifier.coef_ = meta['coef']
+        model.meta_classifier.intercept_ = meta['intercept']
+        model.meta_classifier.classes_ = meta['classes']
+        model.meta_classifier.n_features_in_ = meta['coef'].shape[1]
+        model.classes_ = np.asarray(manifest['classes'])
+        model.feature_names_in_ = manifest['feature_names']
+        model.version_hash = manifest['version_hash']
+        return model
+
 
 if __name__ == '__main__':
     
+    from services.df_building.dataset_io import read_dataset
+
     # test sur une série labélisée
-    df = pd.read_csv("data/AAPL_df_labeled_test.csv")
+    df = read_dataset("data/AAPL_df_labeled_test.csv")
     
     # renommage du label bail de -1 à 2 pour être compatible avec le modèle
     df[df['label'] == -1]  = 2
@@ -100,4 +262,9 @@ if __name__ == '__main__':
                                  xgboost_parameters={'n_estimators': 100, 'learning_rate': 0.1, 'max_depth': 3},
                                 logistic_regression_parameters={'C': 1.0, 'penalty': 'l2', 'multi_class': 'multinomial', 'solver': 'lbfgs'})
     gbm_stacking_model.fit(X, y)
-    predictions = gbm_stacking_model.predict(X)
\ No newline at end of file
+    predictions = gbm_stacking_model.predict(X)
+
+    # artefact natif : rechargé sans pickle, mêmes prédictions
+    gbm_stacking_model.save("models/gbm_stacking_test")
+    loaded_model = GBMStacking.load("models/gbm_stacking_test")
+    assert (loaded_model.predict(X) == predictions).all()
\ No newline at end of file
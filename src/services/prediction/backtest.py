@@ -0,0 +1,165 @@
+"""
+@author: Louis Lebreton
+Backtest vectorisé de la stratégie d'achat / vente (EquityStrategy) sur les labels prédits
+- N scénarios (fenêtre début / fin x frais x tailles d'achat / vente) simulés en une seule passe :
+  la boucle ne porte que sur le temps, l'état (cash, shares) de tous les scénarios est vectorisé
+- les courbes d'équité forment une matrice (N, T) complétée par des NaN, analysée par portfolio_analytics
+"""
+import itertools
+import time
+
+import numpy as np
+import pandas as pd
+
+from services.df_building.get_labels import portfolio_analytics
+
+# scénarios simulés ensemble : borne la mémoire de la matrice d'équité (chunk_size x T)
+CHUNK_SIZE = 4096
+
+SCENARIO_DTYPES = {'start': np.int64, 'end': np.int64, 'transaction_fee': np.float64, 'buy_number': np.float64,
+                   'sell_number': np.float64, 'dca_cash': np.float64}
+ANALYTICS_COLUMNS = ('profit', 'max_drawdown', 'drawdown_duration', 'sharpe', 'sortino', 'calmar')
+
+
+def predictions_to_labels(predictions) -> np.ndarray:
+    """
+    classes du modèle (0 hold, 1 buy, 2 sell) -> labels TBM (0, 1, -1)
+    """
+    predictions = np.asarray(predictions)
+    return np.where(predictions == 2, -1, predictions).astype(np.int8)
+
+
+def scenario_grid(n: int, window_sizes, step: int, transaction_fees=(0.1,), buy_numbers=(1,), sell_numbers=(1,),
+                  dca_cash=(0,)) -> pd.DataFrame:
+    """
+    grille de scénarios : fenêtres glissantes de chaque taille x frais x tailles d'achat / vente
+
+    Args :
+    - n (int): nombre de dates de la série
+    - window_sizes (list): tailles des fenêtres (en pas de temps)
+    - step (int): décalage entre deux fenêtres
+    - transaction_fees, buy_numbers, sell_numbers (list): valeurs testées
+    - dca_cash (list): montants DCA testés (0 : pas de DCA)
+
+    Return:
+    - df_scenarios (pd.DataFrame): colonnes start, end (exclue), transaction_fee, buy_number, sell_number, dca_cash
+    """
+    windows = [(start, start + size) for size in window_sizes for start in range(0, n - size + 1, step)]
+    rows = [(start, end, fee, buy, sell, dca)
+            for (start, end), fee, buy, sell, dca in itertools.product(windows, transaction_fees, buy_numbers,
+                                                                       sell_numbers, dca_cash)]
+    # dtypes explicites : une grille vide (fenêtres plus longues que la série) garde des colonnes numériques
+    return pd.DataFrame(rows, columns=list(SCENARIO_DTYPES)).astype(SCENARIO_DTYPES)
+
+
+def simulate_equity(prices: np.ndarray, labels: np.ndarray, starts: np.ndarray, ends: np.ndarray,
+                    buy_numbers: np.ndarray, sell_numbers: np.ndarray, transaction_fees: np.ndarray,
+                    dca_cash: np.ndarray, cash: float = 100, shares: float = 0) -> np.ndarray:
+    """
+    courbes d'équité de N scénarios, mêmes règles et mêmes calculs que EquityStrategy.buy_and_sell
+
+    Args :
+    - prices (np.ndarray): (n,) prix
+    - labels (np.ndarray): (n,) labels (1 achat, -1 vente, 0 rien)
+    - starts, ends (np.ndarray): (N,) positions de début et de fin (exclue) de chaque scénario
+    - buy_numbers, sell_numbers, transaction_fees (np.ndarray): (N,) paramètres de chaque scénario
+    - dca_cash (np.ndarray): (N,) montant investi à chaque achat en DCA (0 : achat de buy_numbers parts)
+    - cash, shares (float): état initial
+
+    Return:
+    - equity (np.ndarray): (N, T) courbes d'équité, T la plus longue fenêtre, NaN après la fin de chaque fenêtre
+    """
+    lengths = ends - starts
+    n_scenarios, n_steps = len(starts), int(lengths.max(initial=0))
+    cash = np.full(n_scenarios, cash, dtype=np.float64)
+    shares = np.full(n_scenarios, shares, dtype=np.float64)
+    dca = dca_cash > 0
+    equity = np.full((n_scenarios, n_steps), np.nan)
+
+    for t in range(n_steps):
+        active = t < lengths
+        positions = np.where(active, starts + t, 0)
+        price = prices[positions]
+        label = labels[positions]
+
+        buy = active & (label == 1) & (cash > 0)
+        sell = active & (label == -1) & (shares > 0)
+
+        # achat : parts fixes ou montant DCA
+        shares = np.where(buy, shares + np.where(dca, dca_cash / price, buy_numbers), shares)
+        cost = np.where(dca, dca_cash + transaction_fees, (price * buy_numbers) + transaction_fees)
+        cash = np.where(buy, cash - cost, cash)
+        # vente
+        shares = np.where(sell, shares - sell_numbers, shares)
+        cash = np.where(sell, cash + ((price * sell_numbers) - transaction_fees), cash)
+
+        equity[active, t] = (cash + (shares * price))[active]
+    return equity
+
+
+def run_backtest(prices: pd.Series, labels, scenarios: pd.DataFrame, cash: float = 100,
+                 annual_risk_free_rate: float = 0.0, periods_per_year: int = 365,
+                 chunk_size: int = CHUNK_SIZE) -> pd.DataFrame:
+    """
+    backtest de tous les scénarios et table d'analytics
+
+    Args :
+    - prices (pd.Series): prix indexés par date
+    - labels : labels prédits (-1, 0, 1), alignés sur prices
+    - scenarios (pd.DataFrame): scénarios (voir scenario_grid)
+    - cash (float): cash initial de chaque scénario
+    - annual_risk_free_rate (float): taux sans risque des ratios de sharpe et sortino
+    - periods_per_year (int): nombre de pas de temps par an
+    - chunk_size (int): nombre de scénarios simulés ensemble
+
+    Return:
+    - df_results (pd.DataFrame): scénarios, dates de début / fin et profit, max_drawdown, drawdown_duration,
+                                 sharpe, sortino, calmar
+    """
+    start_time = time.perf_counter()
+    price_values = prices.to_numpy(dtype=np.float64)
+    label_values = np.asarray(labels)
+    if len(label_values) != len(price_values):
+        raise ValueError(f"{len(label_values)} labels pour {len(price_values)} prix")
+
+    df_results = scenarios.reset_index(drop=True).astype(SCENARIO_DTYPES)
+    if df_results.empty:
+        # aucun scénario : table vide avec les colonnes du résultat
+        df_results['start_date'] = prices.index[:0]
+        df_results['end_date'] = prices.index[:0]
+        return df_results.assign(**{name: pd.Series(dtype=np.float64) for name in ANALYTICS_COLUMNS})
+
+    columns = {name: df_results[name].to_numpy() for name in ('start', 'end', 'buy_number', 'sell_number',
+                                                               'transaction_fee', 'dca_cash')}
+    analytics = []
+    for chunk in range(0, len(scenarios), chunk_size):
+        part = {name: values[chunk:chunk + chunk_size] for name, values in columns.items()}
+        equity = simulate_equity(price_values, label_values, part['start'], part['end'], part['buy_number'],
+                                 part['sell_number'], part['transaction_fee'], part['dca_cash'], cash=cash)
+        analytics.append(pd.DataFrame(portfolio_analytics.compute_analytics(
+            equity, annual_risk_free_rate=annual_risk_free_rate, periods_per_year=periods_per_year)))
+
+    df_results['start_date'] = prices.index[df_results['start']]
+    df_results['end_date'] = prices.index[df_results['end'] - 1]
+    df_results = pd.concat([df_results, pd.concat(analytics, ignore_index=True)], axis=1)
+    print(f"{len(scenarios)} scénarios simulés en {time.perf_counter() - start_time:.2f}s")
+    return df_results
+
+
+if __name__ == '__main__':
+
+    import joblib
+    from services.df_building.dataset_io import read_dataset_any
+
+    # backtest du modèle HRHP sur le test : fenêtres de 30 à 180 jours x frais x tailles d'ordres
+    risk_profile = 'HRHP'
+    # csv float64 sans schéma, comme à l'entraînement du modèle
+    df_test = read_dataset_any('data', f'test_{risk_profile}', formats=('csv',), schema=False)
+    gbm_stacking_model = joblib.load(f'models/gbm_stacking_model_{risk_profile}.pkl')
+    labels = predictions_to_labels(gbm_stacking_model.predict(df_test.drop(columns=['label'])))
+
+    scenarios = scenario_grid(len(df_test), window_sizes=(30, 60, 90, 180), step=5,
+                              transaction_fees=(0.0, 0.1, 1.0), buy_numbers=(0.0001, 0.0005, 0.001),
+                              sell_numbers=(0.0001, 0.0005, 0.001))
+    df_results = run_backtest(df_test['price'], labels, scenarios)
+    print(df_results.sort_values('sharpe', ascending=False).head(10))
@@ -0,0 +1,264 @@
+"""
+@author: Louis Lebreton
+Recherche des hyperparamètres des GBMs du GBMStacking par successive halving
+- validation croisée temporelle (TimeSeriesSplit)
+- les datasets natifs binnés (Pool catboost, Dataset lightgbm, QuantileDMatrix xgboost) sont construits
+  une seule fois par fold et réutilisés par tous les essais
+- les essais d'un palier tournent en parallèle (threads, les GBMs libèrent le GIL) sous un budget de CPU
+- le budget d'un essai est le nombre d'itérations de boosting, multiplié par eta à chaque palier
+"""
+import math
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import log_loss
+from sklearn.model_selection import TimeSeriesSplit
+
+# espaces de recherche (noms des paramètres des wrappers sklearn, acceptés aussi par les APIs natives)
+# liste : choix parmi les valeurs, tuple (min, max, 'log' | 'linear' | 'int') : tirage dans l'intervalle
+PARAMETER_SPACES = {
+    'catboost': {
+        'depth': [3, 4, 6, 8],
+        'learning_rate': (0.01, 0.3, 'log'),
+        'l2_leaf_reg': (1.0, 10.0, 'log'),
+    },
+    'lightgbm': {
+        'num_leaves': (7, 63, 'int'),
+        'max_depth': [3, 5, 7, -1],
+        'learning_rate': (0.01, 0.3, 'log'),
+        'min_child_samples': (5, 50, 'int'),
+        'subsample': (0.6, 1.0, 'linear'),
+        'subsample_freq': [1],
+        'colsample_bytree': (0.6, 1.0, 'linear'),
+    },
+    'xgboost': {
+        'max_depth': [3, 4, 6, 8],
+        'learning_rate': (0.01, 0.3, 'log'),
+        'min_child_weight': (1.0, 10.0, 'log'),
+        'subsample': (0.6, 1.0, 'linear'),
+        'colsample_bytree': (0.6, 1.0, 'linear'),
+    },
+}
+
+# paramètre du nombre d'itérations dans les wrappers sklearn (GBMStacking)
+ROUNDS_PARAMETER = {'catboost': 'iterations', 'lightgbm': 'n_estimators', 'xgboost': 'n_estimators'}
+
+
+def sample_parameters(space: dict, rng: random.Random) -> dict:
+    """
+    tire un jeu d'hyperparamètres dans un espace de recherche
+    """
+    parameters = {}
+    for name, values in space.items():
+        if isinstance(values, list):
+            parameters[name] = rng.choice(values)
+            continue
+        low, high, scale = values
+        if scale == 'log':
+            parameters[name] = math.exp(rng.uniform(math.log(low), math.log(high)))
+        elif scale == 'int':
+            parameters[name] = rng.randint(low, high)
+        else:
+            parameters[name] = rng.uniform(low, high)
+    return parameters
+
+
+def _as_proba(predictions: np.ndarray) -> np.ndarray:
+    """
+    probabilités (n, n_classes), y compris pour les objectifs binaires qui renvoient (n,)
+    """
+    predictions = np.asarray(predictions)
+    return np.column_stack([1 - predictions, predictions]) if predictions.ndim == 1 else predictions
+
+
+@dataclass
+class FoldDatasets:
+    """
+    datasets d'un fold de validation, construits une fois pour tous les essais
+
+    Attributes:
+    - X_train, y_train, X_valid, y_valid : données du fold (y encodé 0..n_classes-1)
+    - weight_train, weight_valid : poids des observations (ou None)
+    - native : datasets natifs par GBM : {'catboost': (Pool train, Pool valid), 'lightgbm': Dataset train,
+               'xgboost': (QuantileDMatrix train, DMatrix valid)}
+    """
+    X_train: np.ndarray
+    y_train: np.ndarray
+    X_valid: np.ndarray
+    y_valid: np.ndarray
+    weight_train: np.ndarray = None
+    weight_valid: np.ndarray = None
+    native: dict = field(default_factory=dict)
+
+    def build(self, models_to_use: tuple) -> 'FoldDatasets':
+        if 'catboost' in models_to_use:
+            from catboost import Pool
+            self.native['catboost'] = (Pool(self.X_train, self.y_train, weight=self.weight_train),
+                                       Pool(self.X_valid))
+        if 'lightgbm' in models_to_use:
+            import lightgbm as lgb
+            # feature_pre_filter désactivé : le binning ne dépend pas de min_child_samples (tiré par essai),
+            # sinon lightgbm reconstruit le Dataset partagé (et libère son handle pendant les essais parallèles)
+            dataset = lgb.Dataset(self.X_train, self.y_train, weight=self.weight_train, free_raw_data=False,
+                                  params={'verbosity': -1, 'feature_pre_filter': False})
+            self.native['lightgbm'] = dataset.construct()
+        if 'xgboost' in models_to_use:
+            import xgboost as xgb
+            dtrain = xgb.QuantileDMatrix(self.X_train, self.y_train, weight=self.weight_train)
+            self.native['xgboost'] = (dtrain, xgb.DMatrix(self.X_valid))
+        return self
+
+
+def _fit_predict(model_name: str, parameters: dict, rounds: int, fold: FoldDatasets, n_classes: int,
+                 n_threads: int, random_state: int) -> tuple:
+    """
+    entraîne un GBM sur le dataset natif du fold et renvoie ses probabilités (train, valid)
+    """
+    if model_name == 'catboost':
+        from catboost import CatBoostClassifier
+        pool_train, pool_valid = fold.native['catboost']
+        model = CatBoostClassifier(**parameters, iterations=rounds, thread_count=n_threads,
+                                   random_seed=random_state, verbose=False)
+        model.fit(pool_train)
+        return model.predict_proba(pool_train), model.predict_proba(pool_valid)
+
+    if model_name == 'lightgbm':
+        import lightgbm as lgb
+        objective = {'objective': 'multiclass', 'num_class': n_classes} if n_classes > 2 else {'objective': 'binary'}
+        booster = lgb.train({**parameters, **objective, 'num_threads': n_threads, 'seed': random_state,
+                             'verbosity': -1}, fold.native['lightgbm'], num_boost_round=rounds)
+        return _as_proba(booster.predict(fold.X_train)), _as_proba(booster.predict(fold.X_valid))
+
+    import xgboost as xgb
+    dtrain, dvalid = fold.native['xgboost']
+    objective = ({'objective': 'multi:softprob', 'num_class': n_classes} if n_classes > 2
+                 else {'objective': 'binary:logistic'})
+    booster = xgb.train({**parameters, **objective, 'tree_method': 'hist', 'nthread': n_threads,
+                         'seed': random_state, 'verbosity': 0}, dtrain, num_boost_round=rounds)
+    return _as_proba(booster.predict(dtrain)), _as_proba(booster.predict(dvalid))
+
+
+def evaluate_trial(trial: dict, rounds: int, folds: list, models_to_use: tuple, n_classes: int, n_threads: int,
+                   random_state: int = 999) -> float:
+    """
+    log loss moyenne du stacking (GBMs + régression logistique) sur les folds de validation
+    le metaclassifier est entraîné sur les probabilités des GBMs sur le train, comme GBMStacking.fit
+
+    Args :
+    - trial (dict): hyperparamètres par GBM
+    - rounds (int): nombre d'itérations de boosting
+    - folds (list): FoldDatasets construits
+    - n_threads (int): threads alloués à l'essai
+
+    Return:
+    - score (float): log loss moyenne (plus petit = meilleur)
+    """
+    scores = []
+    for fold in folds:
+        probas = [_fit_predict(model_name, trial[model_name], rounds, fold, n_classes, n_threads, random_state)
+                  for model_name in models_to_use]
+        meta_train = np.hstack([proba_train for proba_train, _ in probas])
+        meta_valid = np.hstack([proba_valid for _, proba_valid in probas])
+
+        meta_classifier = LogisticRegression(max_iter=1000)
+        meta_classifier.fit(meta_train, fold.y_train, sample_weight=fold.weight_train)
+        scores.append(log_loss(fold.y_valid, meta_classifier.predict_proba(meta_valid),
+                               labels=meta_classifier.classes_, sample_weight=fold.weight_valid))
+    return float(np.mean(scores))
+
+
+def successive_halving_search(X, y, sample_weight=None, models_to_use=('catboost', 'lightgbm', 'xgboost'),
+                              n_trials: int = 27, min_rounds: int = 50, max_rounds: int = 800, eta: int = 3,
+                              n_splits: int = 4, cpu_budget: int = None, n_workers: int = None,
+                              parameter_spaces: dict = PARAMETER_SPACES, random_state: int = 999) -> tuple:
+    """
+    successive halving sur les hyperparamètres des GBMs du stacking
+
+    chaque palier évalue les essais restants avec rounds itérations, garde le meilleur 1/eta
+    et multiplie rounds par eta, jusqu'à max_rounds ou un seul essai
+
+    Args :
+    - X : features (DataFrame ou tableau), observations dans l'ordre chronologique
+    - y : labels
+    - sample_weight : poids des observations (ex : unicité moyenne des événements TBM) ou None
+    - models_to_use (tuple): GBMs du stacking
+    - n_trials (int): nombre de jeux d'hyperparamètres tirés au premier palier
+    - min_rounds, max_rounds (int): itérations du premier palier et maximum
+    - eta (int): facteur de réduction entre deux paliers
+    - n_splits (int): nombre de folds TimeSeriesSplit
+    - cpu_budget (int): nombre total de threads (défaut : nombre de CPUs)
+    - n_workers (int): essais en parallèle (défaut : cpu_budget // 2), chacun avec cpu_budget // n_workers threads
+    - parameter_spaces (dict): espaces de recherche par GBM
+    - random_state (int): graine des tirages et des GBMs
+
+    Return:
+    - best_parameters (dict): catboost_parameters, lightgbm_parameters, xgboost_parameters pour GBMStacking
+    - df_trials (pd.DataFrame): score de chaque essai à chaque palier
+    """
+    X = np.ascontiguousarray(np.asarray(X, dtype=np.float32))
+    classes, y = np.unique(np.asarray(y), return_inverse=True)
+    weight = None if sample_weight is None else np.asarray(sample_weight, dtype=np.float64)
+
+    cpu_budget = cpu_budget or os.cpu_count() or 1
+    n_workers = max(1, min(n_workers or cpu_budget // 2, cpu_budget, n_trials))
+    n_threads = max(1, cpu_budget // n_workers)
+
+    # datasets binnés construits une fois par fold
+    start = time.perf_counter()
+    folds = []
+    for train_index, valid_index in TimeSeriesSplit(n_splits=n_splits).split(X):
+        folds.append(FoldDatasets(X[train_index], y[train_index], X[valid_index], y[valid_index],
+                                  None if weight is None else weight[train_index],
+                                  None if weight is None else weight[valid_index]).build(models_to_use))
+    print(f"{n_splits} folds construits en {time.perf_counter() - start:.2f}s")
+
+    rng = random.Random(random_state)
+    trials = [{model_name: sample_parameters(parameter_spaces[model_name], rng) for model_name in models_to_use}
+              for _ in range(n_trials)]
+    alive = list(range(n_trials))
+    rounds, rung, rows = min_rounds, 0, []
+
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        while True:
+            start = time.perf_counter()
+            scores = list(executor.map(lambda i: evaluate_trial(trials[i], rounds, folds, models_to_use,
+                                                                len(classes), n_threads, random_state), alive))
+            rows += [{'trial': i, 'rung': rung, 'rounds': rounds, 'score': score, **{
+                f'{model_name}__{name}': value for model_name in models_to_use
+                for name, value in trials[i][model_name].items()}} for i, score in zip(alive, scores)]
+            print(f"palier {rung} : {len(alive)} essais x {rounds} itérations en {time.perf_counter() - start:.2f}s, "
+                  f"meilleure log loss {min(scores):.4f}")
+
+            ranking = [i for _, i in sorted(zip(scores, alive))]
+            if len(alive) == 1 or rounds * eta > max_rounds:
+                best_trial, best_rounds = ranking[0], rounds
+                break
+            alive = ranking[:max(1, len(alive) // eta)]
+            rounds, rung = rounds * eta, rung + 1
+
+    best_parameters = {f'{model_name}_parameters': {**trials[best_trial][model_name],
+                                                     ROUNDS_PARAMETER[model_name]: best_rounds}
+                       for model_name in models_to_use}
+    return best_parameters, pd.DataFrame(rows)
+
+
+if __name__ == '__main__':
+
+    from services.df_building.dataset_io import read_dataset_any
+    from services.prediction.GBM_stacking import GBMStacking
+
+    # recherche sur le train du profil HRHP puis entraînement du stacking avec les meilleurs paramètres
+    df_train = read_dataset_any('data', 'train_HRHP')
+    X, y = df_train.drop(columns=['label']), df_train['label'].replace(-1, 2)
+
+    best_parameters, df_trials = successive_halving_search(X, y, n_trials=27, min_rounds=50, max_rounds=450)
+    print(df_trials.sort_values(['rung', 'score']).groupby('rung').head(3))
+
+    gbm_stacking_model = GBMStacking(**best_parameters)
+    gbm_stacking_model.fit(X, y)